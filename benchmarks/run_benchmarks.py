@@ -0,0 +1,231 @@
+# benchmarks/run_benchmarks.py
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from benchmarks.synthetic import SCENARIOS, make_clip
+from benchmarks.stubs import StubYolo, StubClassifier
+
+RESULTS_DIR = ROOT_DIR / "benchmarks" / "results"
+BASELINE_PATH = ROOT_DIR / "benchmarks" / "baseline.json"
+STAGES = ("decode", "detect", "annotate", "encode", "pose", "classify", "feedback")
+
+
+class TimedClassifier:
+    """Wraps a classifier to time predict_averaged() separately from the feedback step."""
+
+    def __init__(self, classifier):
+        self.classifier = classifier
+        self.seconds = 0.0
+
+    def resize_inputs(self, images):
+        return self.classifier.resize_inputs(images)
+
+    def predict_averaged(self, images, top_k=1, metrics=None):
+        start = time.perf_counter()
+        try:
+            return self.classifier.predict_averaged(images, top_k=top_k, metrics=metrics)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+def load_bench_models(kind):
+    if kind == "stub":
+        return {"yolo": StubYolo(), "classifier": TimedClassifier(StubClassifier())}
+    from src.video_pipeline import load_models
+    models = load_models()
+    models["classifier"] = TimedClassifier(models["classifier"])
+    return models
+
+
+def _stage(seconds, frames=None):
+    return {"seconds": round(seconds, 4), "fps": frames / seconds if frames and seconds > 0 else None}
+
+
+# ========== ONE SCENARIO (own process, so peak RSS is per scenario) ==========
+def run_scenario(name, width, height, frames, models_kind, options):
+    from src.video_pipeline import default_options, scan_video, estimate_pose, analyze_contact
+    from src.metrics import peak_rss_mb
+
+    with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as work_dir:
+        work_dir = Path(work_dir)
+        clip = work_dir / f"{name}.mp4"
+        truth = make_clip(clip, width, height, frames)
+        models = load_bench_models(models_kind)
+        options = default_options(cache=False, **options)
+        output_dir = work_dir / "output"
+        output_dir.mkdir()
+
+        start = time.perf_counter()
+        scan = scan_video(clip, output_dir, options, models)
+        pose_s = analyze_s = 0.0
+        if scan["contact_frame_idx"] != -1 and scan["batsman_box"]:
+            t = time.perf_counter()
+            pose = estimate_pose(scan, output_dir, models["classifier"])
+            pose_s = time.perf_counter() - t
+            t = time.perf_counter()
+            analyze_contact(scan, pose, output_dir, options, models)
+            analyze_s = time.perf_counter() - t
+        wall = time.perf_counter() - start
+
+    stats = scan["stats"]
+    stages = stats["stages"]
+    classify_s = models["classifier"].seconds
+    n = stats["frames"]
+    return {
+        "resolution": f"{width}x{height}",
+        "frames": n,
+        "wall_s": round(wall, 4),
+        "fps": n / wall if wall > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "contact_frame_idx": scan["contact_frame_idx"],
+        "expected_contact_frame_idx": truth["contact_frame_idx"],
+        "bottleneck": stats["bottleneck"],
+        "stages": {
+            "decode": _stage(stages["decode"]["busy_s"], n),
+            "detect": _stage(stages["detect"]["busy_s"], n),
+            "annotate": _stage(max(0.0, stages["annotate_write"]["busy_s"] - stats["encode_s"]), n),
+            "encode": _stage(stats["encode_s"], n),
+            "pose": _stage(pose_s),
+            "classify": _stage(classify_s),
+            "feedback": _stage(max(0.0, analyze_s - classify_s)),
+        },
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scenarios, models_kind="stub", repeat=1, options=None):
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name, width, height, frames in scenarios:
+        runs = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                runs.append(pool.submit(run_scenario, name, width, height, frames,
+                                        models_kind, options or {}).result())
+        # fastest run, the least disturbed by other load on the machine
+        results[name] = min(runs, key=lambda r: r["wall_s"])
+        r = results[name]
+        print(f"[📈] {name}: {r['wall_s']:.2f}s, {r['fps']:.1f} fps, peak RSS {r['peak_rss_mb'] or 0:.0f} MB, "
+              f"bottleneck {r['bottleneck']}")
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "models": models_kind,
+            "repeat": repeat,
+            "options": options or {},
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "scenarios": results,
+    }
+
+
+# ========== REGRESSION CHECK ==========
+def compare(baseline, current, threshold=0.10, min_seconds=0.01):
+    """
+    Flags wall time and stage times that grew by more than `threshold`
+    (relative) and `min_seconds` (absolute) against the baseline.
+    """
+    regressions = []
+    print(f"{'scenario':<14}{'metric':<12}{'baseline':>10}{'current':>10}{'change':>9}")
+    for name, cur in current["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            print(f"{name:<14}(not in baseline)")
+            continue
+        metrics = [("wall", base["wall_s"], cur["wall_s"])]
+        metrics += [(stage, base["stages"][stage]["seconds"], cur["stages"][stage]["seconds"])
+                    for stage in STAGES if stage in base["stages"] and stage in cur["stages"]]
+        for metric, b, c in metrics:
+            change = (c - b) / b if b > 0 else 0.0
+            regressed = c > b * (1 + threshold) and c - b > min_seconds
+            flag = "  ❌" if regressed else ""
+            print(f"{name:<14}{metric:<12}{b:>10.3f}{c:>10.3f}{change:>+8.1%}{flag}")
+            if regressed:
+                regressions.append({"scenario": name, "metric": metric, "baseline": b,
+                                    "current": c, "change": change})
+    if regressions:
+        print(f"[❌] {len(regressions)} regression(s) over {threshold:.0%}")
+    else:
+        print("[✅] No regressions")
+    return regressions
+
+
+def _load(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=4)
+    print(f"[✅] Results saved at {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline on synthetic clips.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run the benchmark scenarios")
+    run.add_argument("--scenarios", default="all",
+                     help=f"Comma-separated subset of: {', '.join(s[0] for s in SCENARIOS)} (default: all)")
+    run.add_argument("--models", choices=("stub", "real"), default="stub",
+                     help="stub: color-based detector and fixed classifier, no weights needed (default)")
+    run.add_argument("--repeat", type=int, default=1, help="Runs per scenario; the fastest is kept")
+    run.add_argument("--options", default="{}",
+                     help='Pipeline option overrides as JSON, e.g. \'{"stride": 5, "roi": true}\'')
+    run.add_argument("--output", default=None, help="Results JSON (default: benchmarks/results/<timestamp>.json)")
+    run.add_argument("--save-baseline", action="store_true", help=f"Also write the results to {BASELINE_PATH}")
+    run.add_argument("--compare", action="store_true", help="Compare against the baseline when done")
+    run.add_argument("--threshold", type=float, default=0.10)
+
+    cmp = sub.add_parser("compare", help="Compare a results file against the baseline")
+    cmp.add_argument("results")
+    cmp.add_argument("--baseline", default=str(BASELINE_PATH))
+    cmp.add_argument("--threshold", type=float, default=0.10,
+                     help="Relative slowdown that counts as a regression (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        regressions = compare(_load(args.baseline), _load(args.results), args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    names = None if args.scenarios == "all" else set(args.scenarios.split(","))
+    scenarios = [s for s in SCENARIOS if names is None or s[0] in names]
+    results = run_benchmarks(scenarios, args.models, args.repeat, json.loads(args.options))
+    output = args.output or str(RESULTS_DIR / f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    _write(output, results)
+    if args.save_baseline:
+        _write(str(BASELINE_PATH), results)
+    if args.compare and os.path.exists(BASELINE_PATH):
+        regressions = compare(_load(BASELINE_PATH), results, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# benchmarks/stubs.py
+
+import cv2
+import numpy as np
+
+# Ranges around the synthetic colors, wide enough for mp4v compression
+BALL_RANGE = ((0, 0, 160), (90, 90, 255))
+BATSMAN_RANGE = ((150, 20, 0), (255, 110, 80))
+
+
+class _Boxes:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Result:
+    def __init__(self, data):
+        self.boxes = _Boxes(data)
+
+
+class StubYolo:
+    """
+    Stands in for the YOLO model on synthetic clips: finds the ball and the
+    batsman by color. Same call shape as ultralytics (list of frames in,
+    results with `.boxes.data` out), so it works on full frames and ROI crops.
+    """
+
+    names = {0: "ball", 1: "batsman"}
+
+    def __call__(self, frames, **kwargs):
+        return [_Result(self._detect(frame)) for frame in frames]
+
+    def _detect(self, frame):
+        rows = []
+        for cls, (lo, hi) in enumerate((BALL_RANGE, BATSMAN_RANGE)):
+            mask = cv2.inRange(frame, lo, hi)
+            points = cv2.findNonZero(mask)
+            if points is not None and len(points) > 4:
+                x, y, w, h = cv2.boundingRect(points)
+                rows.append((x, y, x + w, y + h, 0.9, cls))
+        return np.array(rows, dtype=np.float32).reshape(-1, 6)
+
+
+class StubClassifier:
+    """Fixed-answer stroke classifier with StrokeClassifier's interface."""
+
+    def __init__(self, label="cover_drive", confidence=0.9):
+        self.label = label
+        self.confidence = confidence
+
+    def resize_inputs(self, images):
+        return np.stack([cv2.resize(img, (224, 224), interpolation=cv2.INTER_LINEAR) for img in images])
+
+    def predict_averaged(self, images, top_k=1, metrics=None):
+        return [(self.label, self.confidence)][:top_k]
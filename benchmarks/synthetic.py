@@ -0,0 +1,60 @@
+# benchmarks/synthetic.py
+
+import cv2
+import numpy as np
+
+# BGR colors the stub detector looks for
+BALL_COLOR = (20, 20, 230)
+BATSMAN_COLOR = (200, 60, 30)
+
+# (name, width, height, frames)
+SCENARIOS = (
+    ("480p_short", 854, 480, 90),
+    ("720p_short", 1280, 720, 90),
+    ("720p_long", 1280, 720, 300),
+    ("1080p_short", 1920, 1080, 90),
+)
+
+
+def scene_geometry(width, height, frames):
+    """Batsman box and per-frame ball centers; contact at 60% of the clip."""
+    bw, bh = int(width * 0.12), int(height * 0.45)
+    bx1, by1 = int(width * 0.3), int(height * 0.35)
+    box = (bx1, by1, bx1 + bw, by1 + bh)
+    contact = int(frames * 0.6)
+
+    start = np.array([width * 0.92, height * 0.45])
+    hit = np.array([bx1 + bw * 0.5, by1 + bh * 0.4])
+    away = np.array([width * 0.05, height * 0.05])
+    centers = []
+    for i in range(frames):
+        if i <= contact:
+            p = start + (hit - start) * (i / max(1, contact))
+        else:
+            p = hit + (away - hit) * ((i - contact) / max(1, frames - contact - 1))
+        centers.append((int(p[0]), int(p[1])))
+    return box, centers, contact
+
+
+def make_clip(path, width, height, frames, fps=30, seed=0):
+    """
+    Writes a deterministic cricket-like clip: a textured field, a pitch strip,
+    a batsman rectangle and a ball blob that travels into the batsman and
+    back out. Returns the ground truth (batsman box, ball centers, contact).
+    """
+    rng = np.random.default_rng(seed)
+    background = np.empty((height, width, 3), dtype=np.uint8)
+    background[:] = (40, 140, 40)
+    background += rng.integers(0, 12, size=(height, width, 1), dtype=np.uint8)
+    cv2.rectangle(background, (int(width * 0.25), 0), (int(width * 0.45), height), (120, 170, 190), -1)
+
+    box, centers, contact = scene_geometry(width, height, frames)
+    radius = max(3, width // 160)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(frames):
+        frame = background.copy()
+        cv2.rectangle(frame, box[:2], box[2:], BATSMAN_COLOR, -1)
+        cv2.circle(frame, centers[i], radius, BALL_COLOR, -1)
+        writer.write(frame)
+    writer.release()
+    return {"batsman_box": box, "ball_centers": centers, "contact_frame_idx": contact}
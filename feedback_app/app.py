@@ -2,8 +2,10 @@ import sys
 import os
 import json
 import shutil
+import time
 import datetime
 from pathlib import Path
+from urllib.parse import urlsplit
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -14,54 +16,143 @@ from utils import (
     load_classifier_model,
     predict_stroke_type,
     generate_pdf_report,
-    list_previous_videos
+    save_upload
 )
+from src.analysis_queue import AnalysisQueue
+from src.catalog import Catalog
+from src.media_server import MediaServer
 
 st.set_page_config(page_title="Smart Stroke Analyzer — AI Feedback", layout="centered")
 
 # ========== SIDEBAR NAVIGATION ==========
 st.sidebar.title("🔧 Navigation")
-page = st.sidebar.radio("Go to", ["🏏 Analyze New Stroke", "📊 Dashboard & Stats", "📁 Replay Videos", "📄 Export Report"])
+page = st.sidebar.radio("Go to", ["🏏 Analyze New Stroke", "📊 Dashboard & Stats", "📈 History", "📁 Replay Videos", "📄 Export Report"])
 
 # ========== PATH SETUP ==========
 BASE_DIR = Path(__file__).resolve().parent.parent
 OUTPUT_DIR = BASE_DIR / "data" / "outputs"
 REPORT_PATH = BASE_DIR / "feedback_app" / "stroke_report.pdf"
 
+# ========== ANALYSIS WORKERS ==========
+@st.cache_resource
+def get_analysis_queue():
+    """Warm worker pool shared by every session of this Streamlit server."""
+    return AnalysisQueue()
+
+@st.cache_resource
+def get_catalog():
+    """Index of finished analyses, written by the pipeline."""
+    return Catalog()
+
+@st.cache_resource
+def get_media_server():
+    """Range-capable file server for the outputs, so videos stream instead of loading into the app."""
+    return MediaServer(OUTPUT_DIR)
+
+def request_host():
+    """Host name the browser used for the app (st.context exists from Streamlit 1.37)."""
+    context = getattr(st, "context", None)
+    host = context.headers.get("Host") if context is not None else None
+    return urlsplit(f"//{host}").hostname if host else None
+
+def show_video(path):
+    url = get_media_server().url_for(path, request_host())
+    if url is None:
+        st.warning(f"⚠️ {path} is not an output video and cannot be streamed.")
+    else:
+        st.video(url)
+
+# ========== CATALOG LOOKUPS ==========
+# Shared across sessions and reruns; dropped when a job finishes (see page 1)
+@st.cache_data(ttl=30)
+def latest_analysis():
+    return get_catalog().latest()
+
+@st.cache_data(ttl=30)
+def recent_analyses(limit=200):
+    return get_catalog().recent(limit=limit)
+
+@st.cache_data(ttl=30)
+def analysis_history():
+    catalog = get_catalog()
+    return catalog.stroke_distribution(), catalog.confidence_trend()
+
+@st.cache_data
+def load_run_metrics(output_dir):
+    """metrics.json of one analysis; outputs do not change once written."""
+    path = Path(output_dir) / "metrics.json"
+    if not path.exists():
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+def refresh_catalog_views():
+    for lookup in (latest_analysis, recent_analyses, analysis_history):
+        lookup.clear()
+
+def rerun():
+    (getattr(st, "rerun", None) or st.experimental_rerun)()
+
 # ========== PAGE 1: ANALYZE NEW STROKE ==========
 if page == "🏏 Analyze New Stroke":
     st.title("🏏 Smart Stroke Analyzer — AI Feedback")
     st.write("Upload a cricket stroke video for automatic analysis.")
 
     uploaded_file = st.file_uploader("📁 Choose a video file (.mp4)", type="mp4")
+    jobs = st.session_state.setdefault("jobs", {})
     if uploaded_file:
-        raw_video_path = BASE_DIR / "data" / "raw_videos" / uploaded_file.name
-        with open(raw_video_path, "wb") as f:
-            f.write(uploaded_file.read())
+        # Saved and hashed once per upload; jobs are keyed by content, so a
+        # re-upload of the same clip is not analyzed twice
+        saved = st.session_state.setdefault("saved_uploads", {})
+        upload_id = getattr(uploaded_file, "file_id", None) or uploaded_file.id  # `id` before Streamlit 1.26
+        if upload_id not in saved:
+            saved[upload_id] = save_upload(uploaded_file, BASE_DIR / "data" / "raw_videos")
+        raw_video_path, video_hash = saved[upload_id]
+        upload_key = f"{uploaded_file.name}:{video_hash}"
+        if not any(key.endswith(f":{video_hash}") for key in jobs):
+            jobs[upload_key] = get_analysis_queue().submit(raw_video_path, video_hash=video_hash)
+
+    queue = get_analysis_queue()
+    finished = st.session_state.setdefault("finished_jobs", set())
+    pending = False
+    for upload_key, job_id in reversed(list(jobs.items())):
+        if job_id not in queue:
+            continue
+        status = queue.status(job_id)
+        name = upload_key.rsplit(":", 1)[0]
+        if status["state"] == "done":
+            if job_id not in finished:
+                finished.add(job_id)
+                refresh_catalog_views()
+            result = status["result"]
+            confidence = result.get("confidence")
+            label = result["stroke_type"] + (f" ({confidence*100:.1f}%)" if confidence is not None else "")
+            cached = " (cached result)" if result.get("cache") == "hit" else ""
+            st.success(f"✅ {name} analyzed successfully — {label}{cached}")
+        elif status["state"] == "failed":
+            st.error(f"❌ {name}: {status['error']}")
+        else:
+            pending = True
+            st.progress(status.get("progress", 0.0), text=f"{name}: {status.get('message', 'Queued')}")
 
+    if pending:
         st.info("Running analysis pipeline...")
-        import subprocess
-        subprocess.run(
-            [sys.executable, "src/video_pipeline.py", str(raw_video_path)],
-            check=True
-        )
-        st.success("✅ Video analyzed successfully!")
+        time.sleep(1)
+        rerun()
 
 # ========== PAGE 2: DASHBOARD & STATS ==========
 elif page == "📊 Dashboard & Stats":
     st.title("📊 Stroke Analytics Dashboard")
 
-    outputs = sorted(OUTPUT_DIR.glob("*"), key=os.path.getmtime, reverse=True)
-    if outputs:
-        latest_output = outputs[0]
+    latest = latest_analysis()
+    if latest:
+        latest_output = Path(latest["output_dir"])
         annotated_video = latest_output / "annotated_video_streamlit.mp4"
         contact_frame = latest_output / "contact_frame_pose.jpg"
-        feedback_file = latest_output / "feedback.json"
 
         st.subheader("🎥 Annotated Stroke Video")
         if annotated_video.exists():
-            with open(annotated_video, "rb") as f:
-                st.video(f.read())
+            show_video(annotated_video)
         else:
             st.warning("⚠️ Annotated video not found.")
 
@@ -71,39 +162,97 @@ elif page == "📊 Dashboard & Stats":
         else:
             st.warning("⚠️ Contact frame pose not found.")
 
-        if feedback_file.exists():
-            with open(feedback_file, "r") as f:
-                feedback = json.load(f)
-            st.subheader(f"📝 Stroke Type: {feedback.get('stroke_type', 'unknown')}")
+        st.subheader(f"📝 Stroke Type: {latest['stroke_type']}")
+        if latest["suggestions"]:
             st.write("### AI Suggestions:")
-            for s in feedback.get("suggestions", []):
+            for s in latest["suggestions"]:
                 st.write(f"- {s}")
         else:
             st.warning("⚠️ No feedback available.")
+
+        # ---------- Stage breakdown ----------
+        st.subheader("⏱️ Stage Breakdown")
+        analyses = recent_analyses() or [latest]
+        choices = {
+            f"{a['video_name']} — {a['stroke_type']} "
+            f"({datetime.datetime.fromtimestamp(a['created']):%Y-%m-%d %H:%M})": a["output_dir"]
+            for a in analyses
+        }
+        selected = st.selectbox("Analysis", list(choices))
+        run_metrics = load_run_metrics(choices[selected])
+        if run_metrics and run_metrics.get("spans"):
+            spans = run_metrics["spans"]
+            counters = run_metrics.get("counters", {})
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Total time", f"{run_metrics.get('duration_s', 0):.1f}s")
+            col2.metric("Frames", counters.get("frames", run_metrics.get("frames", 0)))
+            col3.metric("Bottleneck", run_metrics.get("bottleneck") or "-")
+            top_level = {name: span["seconds"] for name, span in spans.items() if "." not in name and name != "total"}
+            st.bar_chart({"seconds": top_level})
+            st.caption("Detection stages run in parallel threads; their busy times overlap.")
+            st.table([{"Span": name, "Seconds": f"{span['seconds']:.3f}", "Calls": span["calls"]}
+                      for name, span in spans.items()])
+            if counters:
+                st.table([{"Counter": name, "Value": value} for name, value in counters.items()])
+        else:
+            st.info("ℹ️ No stage timings recorded for this analysis (run before timings were added).")
     else:
-        st.warning("⚠️ No outputs found yet. Run an analysis first.")
+        st.warning("⚠️ No outputs found yet. Run an analysis first "
+                   "(outputs from older versions: `python -m src.catalog backfill`).")
 
-# ========== PAGE 3: REPLAY PREVIOUS VIDEOS ==========
+# ========== PAGE 3: HISTORY ==========
+elif page == "📈 History":
+    st.title("📈 Analysis History")
+
+    distribution, trend = analysis_history()
+    if distribution:
+        total = sum(d["count"] for d in distribution)
+        st.metric("Analyses", total)
+
+        st.subheader("🏏 Stroke Distribution")
+        st.bar_chart({"analyses": {d["stroke_type"]: d["count"] for d in distribution}})
+        st.table([{
+            "Stroke": d["stroke_type"],
+            "Count": d["count"],
+            "Share": f"{d['count'] / total * 100:.1f}%",
+            "Avg confidence": f"{d['avg_confidence'] * 100:.1f}%" if d["avg_confidence"] is not None else "-",
+            "Avg time (s)": f"{d['avg_duration_s']:.1f}",
+        } for d in distribution])
+
+        st.subheader("📉 Confidence Trend")
+        st.line_chart({"avg confidence": {t["day"]: t["avg_confidence"] for t in trend}})
+        st.bar_chart({"analyses per day": {t["day"]: t["count"] for t in trend}})
+    else:
+        st.warning("⚠️ No analyses catalogued yet. Run an analysis first.")
+
+# ========== PAGE 4: REPLAY PREVIOUS VIDEOS ==========
 elif page == "📁 Replay Videos":
     st.title("🎞️ Replay Previous Videos")
 
-    previous = list_previous_videos(OUTPUT_DIR)
+    previous = recent_analyses()
     if previous:
-        selected = st.selectbox("Select a previous video", previous)
+        labels = {
+            f"{a['video_name']} — {a['stroke_type']} "
+            f"({datetime.datetime.fromtimestamp(a['created']):%Y-%m-%d %H:%M})": a["annotated_video"]
+            for a in previous
+        }
+        selected = st.selectbox("Select a previous video", list(labels))
         if selected:
-            video_path = OUTPUT_DIR / selected
-            with open(video_path, "rb") as f:
-                st.video(f.read())
+            video_path = Path(labels[selected])
+            if video_path.exists():
+                show_video(video_path)
+            else:
+                st.warning("⚠️ This video is no longer on disk.")
     else:
         st.warning("No past videos found.")
 
-# ========== PAGE 4: EXPORT PDF REPORT ==========
+# ========== PAGE 5: EXPORT PDF REPORT ==========
 elif page == "📄 Export Report":
     st.title("📄 Export Analysis Report")
 
-    outputs = sorted(OUTPUT_DIR.glob("*"), key=os.path.getmtime, reverse=True)
-    if outputs:
-        latest_output = outputs[0]
+    latest = latest_analysis()
+    if latest:
+        latest_output = Path(latest["output_dir"])
         feedback_file = latest_output / "feedback.json"
         contact_frame = latest_output / "contact_frame_pose.jpg"
 
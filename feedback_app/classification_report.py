@@ -1,20 +1,26 @@
 import os
+import sys
+import time
 import torch
 import json
+import argparse
 from torchvision import datasets, transforms
-from sklearn.metrics import classification_report
-from utils import load_classifier_model
+from sklearn.metrics import classification_report, f1_score
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from feedback_app.utils import load_classifier_model
+from feedback_app.classifier_backends import BACKENDS, available_backends, load_backend
+from feedback_app.dataset_cache import CACHE_DIR, ensure_cache, memmap_loader
 
 # ========== CONFIGURATION ==========
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATASET_DIR = os.path.join(BASE_DIR, "..", "data", "final_dataset")
 OUTPUT_JSON_PATH = os.path.join(BASE_DIR, "classification_report.json")
+BACKEND_JSON_PATH = os.path.join(BASE_DIR, "backend_comparison.json")
 BATCH_SIZE = 32
 IMAGE_SIZE = 224
 
-# ========== DEVICE SETUP ==========
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-
 # ========== SETUP TRANSFORM ==========
 transform = transforms.Compose([
     transforms.Resize((IMAGE_SIZE, IMAGE_SIZE)),
@@ -23,41 +29,170 @@ transform = transforms.Compose([
                          [0.229, 0.224, 0.225])
 ])
 
+
 # ========== LOAD DATASET ==========
-dataset = datasets.ImageFolder(DATASET_DIR, transform=transform)
-dataloader = torch.utils.data.DataLoader(dataset, batch_size=BATCH_SIZE, shuffle=False)
-class_names = dataset.classes
-print(f"[📁] Found {len(dataset)} images across {len(class_names)} classes.")
+def load_dataset(dataset_dir=DATASET_DIR, batch_size=BATCH_SIZE, workers=0):
+    dataset = datasets.ImageFolder(dataset_dir, transform=transform)
+    dataloader = torch.utils.data.DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=workers)
+    print(f"[📁] Found {len(dataset)} images across {len(dataset.classes)} classes.")
+    return dataloader, dataset.classes
+
+
+def load_cached_dataset(dataset_dir=DATASET_DIR, batch_size=BATCH_SIZE, workers=0, cache_dir=CACHE_DIR):
+    """Same batches as load_dataset(), read from the preprocessed 224x224 memmap."""
+    class_names = ensure_cache(dataset_dir, cache_dir, workers=workers or None)
+    dataloader = memmap_loader(cache_dir, batch_size, workers)
+    print(f"[📁] Loaded {len(dataloader.dataset.labels)} cached images across {len(class_names)} classes.")
+    return dataloader, class_names
+
+
+def timed_batches(dataloader, timing):
+    """Yields the loader's batches, adding the time spent waiting for each to timing["load_s"]."""
+    batches = iter(dataloader)
+    while True:
+        start = time.perf_counter()
+        try:
+            batch = next(batches)
+        except StopIteration:
+            return
+        timing["load_s"] += time.perf_counter() - start
+        yield batch
+
+
+def summarize_timing(timing, images):
+    total = timing["load_s"] + timing["compute_s"]
+    timing.update(
+        images=images,
+        images_per_sec=images / total if total > 0 else None,
+        load_fraction=timing["load_s"] / total if total > 0 else None,
+    )
+    print(f"[📈] {images} images, {timing['images_per_sec'] or 0:.1f} img/s — "
+          f"load {timing['load_s']:.2f}s, compute {timing['compute_s']:.2f}s")
+    return timing
 
-# ========== LOAD MODEL ==========
-model = load_classifier_model()
-model.to(device)
-model.eval()
 
 # ========== PREDICT ==========
-y_true, y_pred = [], []
+def run_report(dataloader, class_names):
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = load_classifier_model()
+    model.to(device)
+    model.eval()
+
+    y_true, y_pred = [], []
+    timing = {"load_s": 0.0, "compute_s": 0.0}
+
+    with torch.inference_mode():
+        for images, labels in timed_batches(dataloader, timing):
+            start = time.perf_counter()
+            images = images.to(device)
+            labels = labels.to(device)
+
+            outputs = model(images)
+            _, preds = torch.max(outputs, 1)
+
+            y_true.extend(labels.cpu().numpy().tolist())
+            y_pred.extend(preds.cpu().numpy().tolist())
+            timing["compute_s"] += time.perf_counter() - start
+
+    report = classification_report(
+        y_true,
+        y_pred,
+        target_names=class_names,
+        output_dict=True
+    )
+    report["timing"] = summarize_timing(timing, len(y_true))
+
+    with open(OUTPUT_JSON_PATH, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+
+    print(f"[✅] classification_report.json saved at {OUTPUT_JSON_PATH}")
+
+
+# ========== BACKEND COMPARISON ==========
+def compare_backends(dataloader, backends):
+    """
+    Runs every batch through each backend on CPU, so all backends see the
+    same decoded inputs. Reports accuracy/F1 and their deltas against the
+    first backend, next to per-batch latency and throughput.
+    """
+    models = {}
+    for backend in backends:
+        try:
+            models[backend] = load_backend(backend)
+        except (FileNotFoundError, ImportError) as e:
+            print(f"[⚠️] Skipping {backend}: {e}")
+    if not models:
+        raise SystemExit("[❌] No backend could be loaded.")
+
+    y_true = []
+    y_pred = {b: [] for b in models}
+    seconds = {b: 0.0 for b in models}
+    images_seen = 0
+    timing = {"load_s": 0.0, "compute_s": 0.0}
+
+    with torch.inference_mode():
+        for images, labels in timed_batches(dataloader, timing):
+            y_true.extend(labels.tolist())
+            images_seen += len(images)
+            for backend, model in models.items():
+                start = time.perf_counter()
+                outputs = model(images)
+                seconds[backend] += time.perf_counter() - start
+                y_pred[backend].extend(outputs.argmax(dim=1).tolist())
+    timing["compute_s"] = sum(seconds.values())
+
+    batches = max(1, len(dataloader))
+    results = {}
+    for backend in models:
+        correct = sum(t == p for t, p in zip(y_true, y_pred[backend]))
+        results[backend] = {
+            "accuracy": correct / max(1, len(y_true)),
+            "macro_f1": f1_score(y_true, y_pred[backend], average="macro", zero_division=0),
+            "latency_ms_per_batch": seconds[backend] / batches * 1000,
+            "images_per_sec": images_seen / max(seconds[backend], 1e-9),
+        }
 
-with torch.no_grad():
-    for images, labels in dataloader:
-        images = images.to(device)
-        labels = labels.to(device)
+    baseline = next(iter(models))
+    for backend, r in results.items():
+        base = results[baseline]
+        r["accuracy_delta"] = r["accuracy"] - base["accuracy"]
+        r["macro_f1_delta"] = r["macro_f1"] - base["macro_f1"]
+        r["speedup"] = r["images_per_sec"] / base["images_per_sec"]
+        r["agreement"] = sum(a == b for a, b in zip(y_pred[backend], y_pred[baseline])) / max(1, len(y_true))
 
-        outputs = model(images)
-        _, preds = torch.max(outputs, 1)
+    with open(BACKEND_JSON_PATH, "w", encoding="utf-8") as f:
+        json.dump({"baseline": baseline, "images": images_seen, "backends": results,
+                   "timing": summarize_timing(timing, images_seen)}, f, indent=4)
 
-        y_true.extend(labels.cpu().numpy().tolist())
-        y_pred.extend(preds.cpu().numpy().tolist())
+    print(f"{'backend':<14}{'acc':>8}{'Δacc':>9}{'F1':>8}{'ΔF1':>9}{'agree':>8}{'ms/batch':>10}{'img/s':>9}{'speedup':>9}")
+    for backend, r in results.items():
+        print(f"{backend:<14}{r['accuracy']:>8.4f}{r['accuracy_delta']:>+9.4f}{r['macro_f1']:>8.4f}"
+              f"{r['macro_f1_delta']:>+9.4f}{r['agreement']:>8.3f}{r['latency_ms_per_batch']:>10.1f}"
+              f"{r['images_per_sec']:>9.1f}{r['speedup']:>8.2f}x")
+    print(f"[✅] backend_comparison.json saved at {BACKEND_JSON_PATH}")
 
-# ========== GENERATE CLASSIFICATION REPORT ==========
-report = classification_report(
-    y_true,
-    y_pred,
-    target_names=class_names,
-    output_dict=True
-)
 
-# ========== SAVE TO JSON ==========
-with open(OUTPUT_JSON_PATH, "w", encoding="utf-8") as f:
-    json.dump(report, f, indent=4)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the stroke classifier on the labelled dataset.")
+    parser.add_argument("--dataset-dir", default=DATASET_DIR)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="DataLoader worker processes (default: min(4, cores))")
+    parser.add_argument("--cache", action="store_true",
+                        help="Read preprocessed 224x224 images from a memory-mapped cache, "
+                             "building it on first use or when the dataset changed")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--compare-backends", nargs="?", const="all", default=None,
+                        help="Comma-separated backends to compare (first is the baseline), "
+                             f"or 'all' for every available one of: {', '.join(BACKENDS)}")
+    args = parser.parse_args()
 
-print(f"[✅] classification_report.json saved at {OUTPUT_JSON_PATH}")
+    if args.cache:
+        dataloader, class_names = load_cached_dataset(args.dataset_dir, args.batch_size, args.workers, args.cache_dir)
+    else:
+        dataloader, class_names = load_dataset(args.dataset_dir, args.batch_size, args.workers)
+    if args.compare_backends:
+        backends = available_backends() if args.compare_backends == "all" else args.compare_backends.split(",")
+        compare_backends(dataloader, backends)
+    else:
+        run_report(dataloader, class_names)
@@ -0,0 +1,165 @@
+# feedback_app/classifier_backends.py
+
+import os
+import sys
+import argparse
+import copy
+import random
+from pathlib import Path
+
+import torch
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from feedback_app.utils import load_classifier_model, transform
+
+# ========== PATHS ==========
+EXPORT_DIR = "models/exported"
+CALIBRATION_DIR = "data/final_dataset"
+IMAGE_SIZE = 224
+
+BACKENDS = ("eager", "torchscript", "int8_dynamic", "int8_static", "onnx")
+
+EXPORT_FILES = {
+    "torchscript": "resnet18_stroke_classifier.ts.pt",
+    "int8_dynamic": "resnet18_stroke_classifier.int8_dynamic.pt",
+    "int8_static": "resnet18_stroke_classifier.int8_static.pt",
+    "onnx": "resnet18_stroke_classifier.onnx",
+}
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+
+def available_backends():
+    return [b for b in BACKENDS if b != "onnx" or ort is not None]
+
+
+def _example_input(batch_size=1):
+    return torch.randn(batch_size, 3, IMAGE_SIZE, IMAGE_SIZE)
+
+
+# ========== CALIBRATION ==========
+def load_calibration_batches(image_dir=CALIBRATION_DIR, num_images=256, batch_size=32, seed=0):
+    """Random sample of dataset images, preprocessed like inference inputs."""
+    files = [p for p in Path(image_dir).rglob("*") if p.suffix.lower() in (".jpg", ".jpeg", ".png")]
+    if not files:
+        raise FileNotFoundError(f"No calibration images found under {image_dir}")
+    random.Random(seed).shuffle(files)
+    tensors = [transform(Image.open(p).convert("RGB")) for p in files[:num_images]]
+    return [torch.stack(tensors[i:i + batch_size]) for i in range(0, len(tensors), batch_size)]
+
+
+# ========== EXPORT ==========
+def _quantize_static(model, calibration_batches):
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    engine = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+    torch.backends.quantized.engine = engine
+    prepared = prepare_fx(model, get_default_qconfig_mapping(engine), (_example_input(),))
+    with torch.inference_mode():
+        for batch in calibration_batches:
+            prepared(batch)
+    return convert_fx(prepared)
+
+
+def export_backend(backend, model=None, export_dir=EXPORT_DIR, calibration_dir=CALIBRATION_DIR):
+    """Exports the classifier for `backend` and returns the written file path."""
+    if backend not in EXPORT_FILES:
+        raise ValueError(f"Nothing to export for backend '{backend}'")
+    model = copy.deepcopy(model) if model is not None else load_classifier_model()
+    model.eval()
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, EXPORT_FILES[backend])
+
+    if backend == "onnx":
+        torch.onnx.export(
+            model, _example_input(), path,
+            input_names=["input"], output_names=["logits"],
+            dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=17
+        )
+        return path
+
+    if backend == "int8_dynamic":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif backend == "int8_static":
+        model = _quantize_static(model, load_calibration_batches(calibration_dir))
+
+    with torch.inference_mode():
+        traced = torch.jit.trace(model, _example_input())
+    torch.jit.save(traced, path)
+    return path
+
+
+# ========== LOAD ==========
+class OnnxClassifier:
+    """ONNX Runtime session with the call signature of a torch classifier."""
+
+    def __init__(self, path, num_threads=None):
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def eval(self):
+        return self
+
+    def __call__(self, inputs):
+        logits = self.session.run(None, {self.input_name: inputs.detach().cpu().numpy()})[0]
+        return torch.from_numpy(logits)
+
+
+def load_backend(backend="eager", export_dir=EXPORT_DIR):
+    """
+    Loads the classifier for an inference backend. Exported backends are
+    read from `export_dir`; run the `export` command first.
+    """
+    if backend == "eager":
+        return load_classifier_model()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+
+    path = os.path.join(export_dir, EXPORT_FILES[backend])
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found; run: python feedback_app/classifier_backends.py export --backend {backend}")
+
+    if backend == "onnx":
+        if ort is None:
+            raise ImportError("onnxruntime is not installed")
+        return OnnxClassifier(path)
+
+    if backend == "int8_static":
+        engine = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+        torch.backends.quantized.engine = engine
+    model = torch.jit.load(path, map_location="cpu")
+    model.eval()
+    if backend == "torchscript":
+        model = torch.jit.optimize_for_inference(torch.jit.freeze(model))
+    return model
+
+
+# ========== CLI ==========
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the stroke classifier to CPU inference backends.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Export one or all backends")
+    export.add_argument("--backend", default="all", choices=("all",) + tuple(EXPORT_FILES))
+    export.add_argument("--export-dir", default=EXPORT_DIR)
+    export.add_argument("--calibration-dir", default=CALIBRATION_DIR,
+                        help="Images used to calibrate static int8 quantization")
+    args = parser.parse_args()
+
+    backends = [b for b in EXPORT_FILES if b != "onnx" or ort is not None] if args.backend == "all" else [args.backend]
+    model = load_classifier_model()
+    for backend in backends:
+        try:
+            path = export_backend(backend, model, args.export_dir, args.calibration_dir)
+            print(f"[✅] {backend}: {path}")
+        except Exception as e:
+            print(f"[❌] {backend}: {e}")
@@ -0,0 +1,132 @@
+# feedback_app/dataset_cache.py
+
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+from PIL import Image
+from torchvision import datasets
+
+# ========== PATHS ==========
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "..", "data", "cache", "final_dataset_224")
+IMAGE_SIZE = 224
+IMAGES_NAME = "images.npy"
+LABELS_NAME = "labels.npy"
+MANIFEST_NAME = "manifest.json"
+
+# Same constants as transforms.Normalize in classification_report / utils
+MEAN = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1)
+STD = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1)
+
+
+def scan_dataset(dataset_dir):
+    """ImageFolder file list and classes, without decoding any image."""
+    folder = datasets.ImageFolder(dataset_dir)
+    files = []
+    for path, label in folder.samples:
+        stat = os.stat(path)
+        files.append([os.path.relpath(path, dataset_dir), label, stat.st_size, stat.st_mtime])
+    return folder.classes, files
+
+
+def _resize_chunk(dataset_dir, cache_dir, start, rel_paths):
+    """Worker: decodes and resizes a slice of the dataset into the shared memmap."""
+    images = np.load(os.path.join(cache_dir, IMAGES_NAME), mmap_mode="r+")
+    for offset, rel in enumerate(rel_paths):
+        img = Image.open(os.path.join(dataset_dir, rel)).convert("RGB")
+        # Resize((224, 224)) of the eval transform, done once
+        images[start + offset] = np.asarray(img.resize((IMAGE_SIZE, IMAGE_SIZE), Image.BILINEAR))
+    images.flush()
+    return len(rel_paths)
+
+
+def build_cache(dataset_dir, cache_dir=CACHE_DIR, workers=None, chunk_size=256):
+    """
+    Decodes and resizes every dataset image once into `images.npy`, an
+    (N, 224, 224, 3) uint8 array, plus `labels.npy` and a manifest of the
+    source files (path, label, size, mtime) and classes.
+    """
+    classes, files = scan_dataset(dataset_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    # Drop the old manifest before touching the arrays, so an interrupted
+    # rebuild reads as stale instead of describing arrays of another shape
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    start = time.perf_counter()
+
+    images = np.lib.format.open_memmap(os.path.join(cache_dir, IMAGES_NAME), mode="w+", dtype=np.uint8,
+                                       shape=(len(files), IMAGE_SIZE, IMAGE_SIZE, 3))
+    del images
+    np.save(os.path.join(cache_dir, LABELS_NAME), np.array([f[1] for f in files], dtype=np.int64))
+
+    rel_paths = [f[0] for f in files]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(_resize_chunk, dataset_dir, cache_dir, i, rel_paths[i:i + chunk_size])
+                   for i in range(0, len(rel_paths), chunk_size)]
+        done = sum(f.result() for f in futures)
+
+    # Manifest last and atomically: a cache without one is incomplete and gets rebuilt
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"dataset_dir": os.path.abspath(dataset_dir), "classes": classes,
+                   "image_size": IMAGE_SIZE, "files": files}, f)
+    os.replace(tmp_path, manifest_path)
+    print(f"[✅] Cached {done} images at {cache_dir} in {time.perf_counter() - start:.1f}s")
+    return classes
+
+
+def is_stale(dataset_dir, cache_dir=CACHE_DIR):
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return True
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    classes, files = scan_dataset(dataset_dir)
+    return manifest["classes"] != classes or manifest["files"] != files
+
+
+def ensure_cache(dataset_dir, cache_dir=CACHE_DIR, workers=None):
+    """Builds the cache if it is missing or the dataset changed; returns the class names."""
+    if is_stale(dataset_dir, cache_dir):
+        print(f"[📦] Building preprocessed cache for {dataset_dir} ...")
+        return build_cache(dataset_dir, cache_dir, workers)
+    with open(os.path.join(cache_dir, MANIFEST_NAME), "r") as f:
+        return json.load(f)["classes"]
+
+
+# ========== LOADING ==========
+class MemmapBatches(torch.utils.data.Dataset):
+    """
+    Batches straight from the memmap: item `i` is batch `i` as a normalized
+    (B, 3, 224, 224) float tensor and its labels. Each DataLoader worker maps
+    the file itself, so only the finished batches cross processes.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, batch_size=32):
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        self.labels = np.load(os.path.join(cache_dir, LABELS_NAME))
+        self._images = None
+
+    def __len__(self):
+        return (len(self.labels) + self.batch_size - 1) // self.batch_size
+
+    def __getitem__(self, idx):
+        if self._images is None:
+            self._images = np.load(os.path.join(self.cache_dir, IMAGES_NAME), mmap_mode="r")
+        sl = slice(idx * self.batch_size, (idx + 1) * self.batch_size)
+        # ToTensor + Normalize, vectorized over the batch
+        images = torch.from_numpy(np.ascontiguousarray(self._images[sl])).permute(0, 3, 1, 2).float().div_(255)
+        images = (images - MEAN) / STD
+        return images, torch.from_numpy(self.labels[sl])
+
+
+def memmap_loader(cache_dir=CACHE_DIR, batch_size=32, workers=0):
+    dataset = MemmapBatches(cache_dir, batch_size)
+    return torch.utils.data.DataLoader(dataset, batch_size=None, shuffle=False, num_workers=workers,
+                                       persistent_workers=workers > 0)
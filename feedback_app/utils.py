@@ -1,14 +1,21 @@
 import torch
 import json
 import os
+import uuid
+import hashlib
+from functools import lru_cache
+import numpy as np
 from PIL import Image
 from fpdf import FPDF
 import torchvision.transforms as transforms
 from torchvision import models
 
+from src.metrics import NULL_METRICS
+
 # ========== PATHS ==========
 CLASSIFIER_MODEL_PATH = "models/resnet18_stroke_classifier.pth"
 CLASS_MAPPING_PATH = "utils/class_mapping.json"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 # ========== TRANSFORMS ==========
 transform = transforms.Compose([
@@ -18,10 +25,17 @@ transform = transforms.Compose([
                          [0.229, 0.224, 0.225])
 ])
 
+# ========== CLASS MAPPING ==========
+@lru_cache(maxsize=None)
+def load_class_mapping(path=CLASS_MAPPING_PATH):
+    """Index -> label mapping, parsed once per process."""
+    with open(path, "r") as f:
+        class_mapping = json.load(f)
+    return {int(k): v for k, v in class_mapping.items()}
+
 # ========== LOAD MODEL ==========
 def load_classifier_model():
-    with open(CLASS_MAPPING_PATH, "r") as f:
-        class_mapping = json.load(f)
+    class_mapping = load_class_mapping()
 
     model = models.resnet18(pretrained=False)
     model.fc = torch.nn.Linear(model.fc.in_features, len(class_mapping))
@@ -38,15 +52,65 @@ def predict_stroke_type(image_file, model):
         outputs = model(input_tensor)
         _, predicted = torch.max(outputs, 1)
 
-    with open(CLASS_MAPPING_PATH, "r") as f:
-        class_mapping = json.load(f)
-
-    idx_to_class = {int(k): v for k, v in class_mapping.items()}
+    idx_to_class = load_class_mapping()
     label = idx_to_class[predicted.item()]
     confidence = torch.nn.functional.softmax(outputs, dim=1)[0][predicted.item()].item()
 
     return label, confidence
 
+# ========== IN-MEMORY CLASSIFIER ==========
+class StrokeClassifier:
+    """
+    Stroke classifier over in-memory BGR frames or crops.
+
+    Uses the same resize/normalize transform as `predict_stroke_type`, but
+    takes NumPy arrays directly and classifies a whole list in one forward
+    pass, so no image has to round-trip through disk.
+    """
+
+    def __init__(self, model=None):
+        self.model = model if model is not None else load_classifier_model()
+        self.model.eval()
+        self.idx_to_class = load_class_mapping()
+
+    def preprocess(self, images):
+        """List of BGR uint8 arrays -> (N, 3, 224, 224) normalized tensor."""
+        return torch.stack([transform(Image.fromarray(np.ascontiguousarray(img[..., ::-1]))) for img in images])
+
+    def resize_inputs(self, images):
+        """
+        BGR frames -> (N, 224, 224, 3) uint8 BGR, resized exactly as `transform`
+        does. Classifying these gives the same logits as the original frames,
+        so they can be stored in place of full frames.
+        """
+        return np.stack([
+            np.asarray(Image.fromarray(np.ascontiguousarray(img[..., ::-1])).resize((224, 224), Image.BILINEAR))[..., ::-1]
+            for img in images
+        ])
+
+    def logits(self, images, metrics=None):
+        """`metrics` (src.metrics.Metrics, optional) gets classify.* spans and an image count."""
+        metrics = metrics or NULL_METRICS
+        with metrics.span("classify.preprocess"):
+            inputs = self.preprocess(images)
+        with metrics.span("classify.forward"), torch.inference_mode():
+            logits = self.model(inputs)
+        metrics.count("classify.images", len(images))
+        return logits
+
+    def _top_k(self, logits, top_k):
+        probs = torch.nn.functional.softmax(logits, dim=-1)
+        values, indices = probs.topk(min(top_k, probs.shape[-1]), dim=-1)
+        return [(self.idx_to_class[i], p) for i, p in zip(indices.tolist(), values.tolist())]
+
+    def predict(self, images, top_k=1, metrics=None):
+        """Returns a list of [(label, probability), ...] (top-k) per image."""
+        return [self._top_k(row, top_k) for row in self.logits(images, metrics)]
+
+    def predict_averaged(self, images, top_k=1, metrics=None):
+        """Averages the logits of several frames (e.g. around contact) into one top-k."""
+        return self._top_k(self.logits(images, metrics).mean(dim=0), top_k)
+
 # ========== PDF REPORT ==========
 def generate_pdf_report(report_path, stroke_type, suggestions, contact_pose_path):
     pdf = FPDF()
@@ -73,6 +137,28 @@ def generate_pdf_report(report_path, stroke_type, suggestions, contact_pose_path
 
     pdf.output(report_path)
 
+# ========== UPLOADS ==========
+def save_upload(uploaded_file, upload_dir, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Streams an uploaded file to disk in fixed-size chunks, hashing as it goes.
+    Files land in <upload_dir>/<hash prefix>/<name>, so same-named clips never
+    overwrite each other. Returns (path, sha256 hex digest).
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    tmp_path = os.path.join(upload_dir, f".{uuid.uuid4().hex}.part")
+    uploaded_file.seek(0)
+    with open(tmp_path, "wb") as f:
+        for chunk in iter(lambda: uploaded_file.read(chunk_size), b""):
+            digest.update(chunk)
+            f.write(chunk)
+    video_hash = digest.hexdigest()
+    dest_dir = os.path.join(upload_dir, video_hash[:16])
+    os.makedirs(dest_dir, exist_ok=True)
+    dest = os.path.join(dest_dir, os.path.basename(uploaded_file.name))
+    os.replace(tmp_path, dest)
+    return dest, video_hash
+
 # ========== VIDEO LISTING ==========
 def list_previous_videos(output_dir):
     videos = []
@@ -1,46 +1,72 @@
 # pose_estimation/ai_feedback.py
 
+from pathlib import Path
+
 import numpy as np
 
-# Helper to check distance between 2 points
-def is_deviation(pt1, pt2, threshold=0.07):
-    return np.linalg.norm(np.array(pt1) - np.array(pt2)) > threshold
+from pose_estimation.pose_compare import KEYPOINTS, PoseComparator, evaluate_rules
+
+PHASE_LABELS = {
+    "backlift": "backlift",
+    "contact": "contact",
+    "follow_through": "follow-through",
+}
+
+# Mean normalized distance from the aligned reference above which a joint is flagged
+PHASE_DEVIATION_THRESHOLD = 0.25
+
+def get_phase_suggestions(phase_deviations, max_per_phase=2):
+    """
+    Turns per-phase (33,) joint deviations from the DTW comparison into
+    suggestions, naming the worst joints of each phase.
+    """
+    suggestions = []
+    for phase, deviations in phase_deviations.items():
+        flagged = sorted(
+            ((deviations[idx], name) for name, idx in KEYPOINTS.items()
+             if deviations[idx] > PHASE_DEVIATION_THRESHOLD),
+            reverse=True
+        )
+        for dev, name in flagged[:max_per_phase]:
+            suggestions.append(
+                f"⚠️ {name.replace('_', ' ').capitalize()} is off the reference line during the "
+                f"{PHASE_LABELS.get(phase, phase)} (deviation {dev:.2f})."
+            )
+    return suggestions
+
+def _as_pose(pose):
+    return np.load(pose) if isinstance(pose, (str, Path)) else np.asarray(pose)
 
-def get_ai_suggestions(ref_pose_path, test_pose_path, stroke_type):
+def get_ai_suggestions(ref_pose, test_pose, stroke_type, phase_deviations=None):
+    """
+    Rule-table checks of the contact pose against the reference pose (skipped
+    if `ref_pose` is None), plus per-phase suggestions from a stroke sequence
+    comparison. Poses may be pre-loaded arrays or .npy paths.
+    """
     suggestions = []
-    
-    ref_pose = np.load(ref_pose_path)
-    test_pose = np.load(test_pose_path)
-
-    # Nose, Head, Shoulder, Elbow, Wrist, Hip, Knee, Ankle
-    keypoints = {
-        "head": 0,
-        "left_shoulder": 11,
-        "right_shoulder": 12,
-        "left_elbow": 13,
-        "right_elbow": 14,
-        "left_hip": 23,
-        "right_hip": 24,
-        "left_knee": 25,
-        "right_knee": 26,
-        "left_ankle": 27,
-        "right_ankle": 28
-    }
-
-    # Example rules for cover drive
-    if stroke_type == "cover_drive":
-        if is_deviation(test_pose[keypoints["left_ankle"]][:2], ref_pose[keypoints["left_ankle"]][:2]):
-            suggestions.append("⚠️ Front foot not placed forward enough.")
-        
-        if is_deviation(test_pose[keypoints["right_elbow"]][:2], ref_pose[keypoints["right_elbow"]][:2]):
-            suggestions.append("⚠️ Elbow should be higher for proper bat lift.")
-        
-        if is_deviation(test_pose[keypoints["head"]][:2], ref_pose[keypoints["head"]][:2]):
-            suggestions.append("⚠️ Keep your head steady and aligned over the ball.")
-
-    # Add more strokes: pull_shot, leg_glance, etc
+
+    if ref_pose is not None:
+        test_pose = _as_pose(test_pose)
+        if test_pose.size:
+            deviations = PoseComparator(_as_pose(ref_pose)).deviations(test_pose)
+            rules, flagged = evaluate_rules(deviations, stroke_type)
+            suggestions.extend(rule["message"] for rule, hit in zip(rules, flagged) if hit)
+        else:
+            suggestions.append("⚠️ No pose detected at the contact frame.")
+
+    if phase_deviations:
+        suggestions.extend(get_phase_suggestions(phase_deviations))
 
     if not suggestions:
         suggestions.append("✅ Excellent pose! No major issues detected.")
 
     return suggestions
+
+def score_poses(ref_pose, test_poses, stroke_type):
+    """
+    Scores a batch of (N, 33, 4) test poses against one reference in a single
+    NumPy pass. Returns (N, 33) deviations and the (N, n_rules) rule hits.
+    """
+    deviations = PoseComparator(_as_pose(ref_pose)).deviations(_as_pose(test_poses))
+    _, flagged = evaluate_rules(deviations, stroke_type)
+    return deviations, flagged
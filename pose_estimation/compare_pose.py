@@ -1,6 +1,8 @@
 import numpy as np
 import os
 
+from pose_compare import PoseComparator
+
 print("Available pose files:")
 for f in os.listdir("pose_estimation/keypoints"):
     if f.endswith(".npy"):
@@ -20,14 +22,13 @@ keypoint_names = {
     27: "Left Ankle", 28: "Right Ankle"
 }
 
-tolerance = 0.07  # 7% of frame size distance
+tolerance = 0.3  # normalized distance (RMS body radius) after alignment
 
-# Compare keypoints
-for idx, name in keypoint_names.items():
-    ref_point = ref_pose[idx][:2]  # (x, y)
-    test_point = test_pose[idx][:2]
+# Compare all keypoints at once, translation/scale/rotation aligned
+deviations = PoseComparator(ref_pose).deviations(test_pose)
 
-    dist = np.linalg.norm(np.array(ref_point) - np.array(test_point))
+for idx, name in keypoint_names.items():
+    dist = deviations[idx]
 
     if dist > tolerance:
         print(f"⚠️ {name} deviates too much ({dist:.3f}) — adjust your position.")
@@ -0,0 +1,200 @@
+# pose_estimation/dtw.py
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from pose_estimation.pose_compare import normalize_poses, pose_distances
+
+REFERENCE_DIR = Path(__file__).resolve().parent / "reference_poses"
+
+PHASES = ("backlift", "contact", "follow_through")
+
+# Same threshold as PoseComparator: joints less visible than this in either pose are not scored
+MIN_VISIBILITY = 0.3
+
+
+# ========== FEATURES ==========
+def pose_features(poses):
+    """
+    Turns (..., 33, 4) keypoints into normalized (..., 33, 2) coordinates
+    (see pose_compare.normalize_poses) plus (..., 33) visibility weights.
+    """
+    normalized = normalize_poses(poses)
+    return normalized[..., :2], normalized[..., 3]
+
+
+# ========== DTW ==========
+def dtw_distances(query, references):
+    """
+    DTW cost of one (T, 33, 4) query against a list of (Ti, 33, 4) references.
+
+    References are padded into one (B, R, 33, 2) block and aligned together.
+    Each DP row is solved with a cumulative-sum/min-accumulate scan, so the
+    only Python loop is over the T query frames. Costs are normalized by
+    path length bound (T + Ti). Returns a (B,) array.
+    """
+    q_feat, q_vis = pose_features(query)
+    lengths = np.array([len(r) for r in references])
+    B, R = len(references), lengths.max()
+
+    r_feat = np.zeros((B, R, 33, 2))
+    r_vis = np.zeros((B, R, 33))
+    for b, ref in enumerate(references):
+        r_feat[b, :len(ref)], r_vis[b, :len(ref)] = pose_features(ref)
+
+    prev = None
+    for cost in pose_distances(q_feat, q_vis, r_feat, r_vis):
+        prev = _dtw_row(prev, cost)
+    return prev[np.arange(B), lengths - 1] / (len(q_feat) + lengths)
+
+
+def _dtw_row(prev, cost):
+    """
+    One DTW row: D[j] = cost[j] + min(prev[j], prev[j-1], D[j-1]).
+    Solved as D = S + cummin(m - S) with S = cumsum(cost) along the last axis.
+    """
+    if prev is None:
+        return np.cumsum(cost, axis=-1)
+    shifted = np.concatenate([np.full(prev.shape[:-1] + (1,), np.inf), prev[..., :-1]], axis=-1)
+    m = cost + np.minimum(prev, shifted)
+    s = np.cumsum(cost, axis=-1)
+    return s + np.minimum.accumulate(m - s, axis=-1)
+
+
+def dtw_path(query, reference):
+    """Full DTW alignment between two sequences; returns a list of (i, j) pairs."""
+    q_feat, q_vis = pose_features(query)
+    r_feat, r_vis = pose_features(reference)
+    costs = pose_distances(q_feat, q_vis, r_feat, r_vis)
+
+    acc = np.empty_like(costs)
+    prev = None
+    for i, cost in enumerate(costs):
+        acc[i] = prev = _dtw_row(prev, cost)
+
+    i, j = acc.shape[0] - 1, acc.shape[1] - 1
+    path = [(i, j)]
+    while i > 0 or j > 0:
+        steps = []
+        if i > 0 and j > 0:
+            steps.append((acc[i - 1, j - 1], i - 1, j - 1))
+        if i > 0:
+            steps.append((acc[i - 1, j], i - 1, j))
+        if j > 0:
+            steps.append((acc[i, j - 1], i, j - 1))
+        _, i, j = min(steps)
+        path.append((i, j))
+    return path[::-1]
+
+
+# ========== PHASES ==========
+def phase_of(frame_idx, contact_idx, contact_half_width=2):
+    if frame_idx < contact_idx - contact_half_width:
+        return "backlift"
+    if frame_idx > contact_idx + contact_half_width:
+        return "follow_through"
+    return "contact"
+
+
+def phase_deviations(query, reference, path, contact_idx, ref_contact_idx, min_visibility=MIN_VISIBILITY):
+    """
+    Mean per-joint distance along the alignment path, split by stroke phase.
+
+    Only pairs where the query frame and its aligned reference frame are in
+    the same phase count, so a phase the reference does not cover (e.g. the
+    backlift of a single contact pose) gets no deviations at all. Joints
+    below `min_visibility` in either frame are left out of the mean; a joint
+    never visible in a phase reports 0, like PoseComparator.
+    Returns {phase: (33,) array}.
+    """
+    q_feat, q_vis = pose_features(query)
+    r_feat, r_vis = pose_features(reference)
+    pairs = np.array(path)
+    dist = np.linalg.norm(q_feat[pairs[:, 0]] - r_feat[pairs[:, 1]], axis=-1)
+    visible = np.minimum(q_vis[pairs[:, 0]], r_vis[pairs[:, 1]]) >= min_visibility
+    q_phases = np.array([phase_of(i, contact_idx) for i in pairs[:, 0]])
+    r_phases = np.array([phase_of(j, ref_contact_idx) for j in pairs[:, 1]])
+
+    deviations = {}
+    for phase in PHASES:
+        rows = (q_phases == phase) & (r_phases == phase)
+        if rows.any():
+            counts = visible[rows].sum(axis=0)
+            total = np.where(visible[rows], dist[rows], 0.0).sum(axis=0)
+            deviations[phase] = np.where(counts > 0, total / np.maximum(counts, 1), 0.0)
+    return deviations
+
+
+# ========== REFERENCES ==========
+_reference_cache = {}
+
+
+def _contact_index(path, length):
+    """Contact frame of a reference sequence: `<name>.json` {"contact_idx": i} if present, else the middle."""
+    sidecar = path.with_suffix(".json")
+    if sidecar.exists():
+        with open(sidecar, "r") as f:
+            return int(json.load(f)["contact_idx"])
+    return length // 2
+
+
+def load_sequence(path):
+    """A reference file as ((T, 33, 4) frames with a pose, contact index among them)."""
+    poses = np.asarray(np.load(path))
+    if poses.ndim == 2:
+        poses = poses[None]
+    valid = ~np.isnan(poses).any(axis=(1, 2))
+    # contact index among the frames that survive dropping pose-less ones
+    contact = int(np.searchsorted(np.flatnonzero(valid), _contact_index(path, len(poses))))
+    return poses[valid], min(contact, max(int(valid.sum()) - 1, 0))
+
+
+def load_reference_sequences(stroke_type, ref_dir=REFERENCE_DIR):
+    """
+    Reference sequences for a stroke: every (T, 33, 4) file in
+    `reference_poses/<stroke_type>/`, plus `reference_poses/<stroke_type>.npy`
+    as a one-frame sequence that only covers the contact phase. The k-NN
+    library (reference_library.py) reads the same tree.
+    Returns a list of (name, array, contact index) triples.
+    """
+    ref_dir = Path(ref_dir)
+    files = sorted((ref_dir / stroke_type).glob("*.npy")) if (ref_dir / stroke_type).is_dir() else []
+    if (ref_dir / f"{stroke_type}.npy").exists():
+        files.append(ref_dir / f"{stroke_type}.npy")
+    # Keyed by the files and their mtimes, so long-lived workers see added or edited references
+    stats = [f.stat() for f in files]
+    key = (str(ref_dir), stroke_type, tuple((str(f), st.st_size, st.st_mtime) for f, st in zip(files, stats)))
+    if key not in _reference_cache:
+        for old in [k for k in _reference_cache if k[:2] == key[:2]]:
+            del _reference_cache[old]
+        sequences = [(f.stem,) + load_sequence(f) for f in files]
+        _reference_cache[key] = [(name, seq, contact) for name, seq, contact in sequences if len(seq)]
+    return _reference_cache[key]
+
+
+def compare_stroke(stroke_pose, references, contact_idx):
+    """
+    Aligns a (T, 33, 4) stroke against named reference sequences.
+    Frames without a pose are dropped first. Returns None if nothing is left
+    to compare, else the best reference, all distances and per-phase deviations.
+    """
+    stroke_pose = np.asarray(stroke_pose)
+    valid = ~np.isnan(stroke_pose).any(axis=(1, 2))
+    if not valid.any() or not references:
+        return None
+    query = stroke_pose[valid]
+    contact_idx = int(np.searchsorted(np.flatnonzero(valid), contact_idx))
+
+    names = [name for name, _, _ in references]
+    distances = dtw_distances(query, [seq for _, seq, _ in references])
+    best = int(np.argmin(distances))
+    _, best_seq, best_contact = references[best]
+    path = dtw_path(query, best_seq)
+    return {
+        "best_reference": names[best],
+        "distance": float(distances[best]),
+        "distances": dict(zip(names, distances.tolist())),
+        "phase_deviations": phase_deviations(query, best_seq, path, contact_idx, best_contact),
+    }
@@ -0,0 +1,145 @@
+# pose_estimation/pose_compare.py
+
+import json
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+RULES_PATH = Path(__file__).resolve().parent / "stroke_rules.json"
+
+# Nose, Head, Shoulder, Elbow, Wrist, Hip, Knee, Ankle
+KEYPOINTS = {
+    "head": 0,
+    "left_shoulder": 11,
+    "right_shoulder": 12,
+    "left_elbow": 13,
+    "right_elbow": 14,
+    "left_wrist": 15,
+    "right_wrist": 16,
+    "left_hip": 23,
+    "right_hip": 24,
+    "left_knee": 25,
+    "right_knee": 26,
+    "left_ankle": 27,
+    "right_ankle": 28
+}
+
+
+# ========== NORMALIZATION ==========
+def normalize_poses(poses):
+    """
+    Translation/scale normalization of (..., 33, 4) keypoints.
+
+    x, y are moved to the visibility-weighted centroid and divided by the
+    weighted RMS distance from it, so poses of different sizes and positions
+    in the frame become comparable. z and visibility are passed through.
+    """
+    poses = np.asarray(poses, dtype=np.float64)
+    xy, vis = poses[..., :2], np.clip(poses[..., 3], 0.0, 1.0)
+    w = vis / np.maximum(vis.sum(-1, keepdims=True), 1e-6)
+
+    centroid = (xy * w[..., None]).sum(-2, keepdims=True)
+    centred = xy - centroid
+    scale = np.sqrt((w * (centred ** 2).sum(-1)).sum(-1))
+    scale = np.where(scale > 1e-6, scale, 1.0)
+
+    out = poses.copy()
+    out[..., :2] = centred / scale[..., None, None]
+    out[..., 3] = vis
+    return out
+
+
+def align_rotation(tests, reference):
+    """
+    Rotates normalized test poses (N, 33, 4) onto a normalized reference
+    (33, 4) with the weighted 2D Procrustes angle, all poses at once.
+    """
+    a, b = tests[..., :2], reference[..., :2]
+    w = np.minimum(tests[..., 3], reference[..., 3])
+    cross = (w * (a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0])).sum(-1)
+    dot = (w * (a * b).sum(-1)).sum(-1)
+    theta = np.arctan2(cross, dot)
+    cos, sin = np.cos(theta)[..., None], np.sin(theta)[..., None]
+
+    out = tests.copy()
+    out[..., 0] = cos * a[..., 0] - sin * a[..., 1]
+    out[..., 1] = sin * a[..., 0] + cos * a[..., 1]
+    return out
+
+
+# ========== COMPARISON ==========
+def pose_distances(q_feat, q_vis, r_feat, r_vis):
+    """
+    Visibility-weighted RMS joint distance between normalized query poses
+    (T, 33, 2) and reference poses (..., R, 33, 2). Returns (T, ..., R).
+
+    With weights w = vis_q * vis_r the weighted squared distance expands into
+    matrix products, so the whole cost block is a few BLAS calls.
+    """
+    batch_shape = r_feat.shape[:-2]
+    r_feat = r_feat.reshape(-1, 33, 2)
+    r_vis = r_vis.reshape(-1, 33)
+
+    q_sq = (q_feat ** 2).sum(-1)
+    r_sq = (r_feat ** 2).sum(-1)
+    q_w = (q_feat * q_vis[..., None]).reshape(len(q_feat), -1)
+    r_w = (r_feat * r_vis[..., None]).reshape(len(r_feat), -1)
+
+    num = (q_vis * q_sq) @ r_vis.T + q_vis @ (r_vis * r_sq).T - 2 * q_w @ r_w.T
+    den = q_vis @ r_vis.T
+    costs = np.sqrt(np.maximum(num, 0) / np.maximum(den, 1e-6))
+    return costs.reshape((len(q_feat),) + batch_shape)
+
+
+class PoseComparator:
+    """
+    Scores test poses against one reference pose on all 33 landmarks at once.
+
+    `deviations()` takes a (33, 4) pose or an (N, 33, 4) batch and returns the
+    per-joint distance after alignment, in units of the body's RMS radius.
+    Joints that are not visible enough in either pose are reported as 0.
+    """
+
+    def __init__(self, reference, rotate=True, min_visibility=0.3):
+        self.reference = normalize_poses(reference)
+        self.rotate = rotate
+        self.min_visibility = min_visibility
+
+    def deviations(self, tests):
+        tests = np.asarray(tests, dtype=np.float64)
+        single = tests.ndim == 2
+        tests = normalize_poses(tests[None] if single else tests)
+        if self.rotate:
+            tests = align_rotation(tests, self.reference)
+
+        dist = np.linalg.norm(tests[..., :2] - self.reference[..., :2], axis=-1)
+        visible = np.minimum(tests[..., 3], self.reference[..., 3]) >= self.min_visibility
+        dist = np.where(visible, dist, 0.0)
+        return dist[0] if single else dist
+
+
+# ========== RULES ==========
+@lru_cache(maxsize=None)
+def load_stroke_rules(path=RULES_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def rules_for(stroke_type, rules=None):
+    """Rule table for a stroke, falling back to the "_default" table."""
+    rules = load_stroke_rules() if rules is None else rules
+    return rules.get(stroke_type, rules.get("_default", []))
+
+
+def evaluate_rules(deviations, stroke_type, rules=None):
+    """
+    Applies a stroke's rule table to (33,) or (N, 33) deviations.
+    Returns the rule list and a (n_rules,) or (N, n_rules) boolean array.
+    """
+    table = rules_for(stroke_type, rules)
+    if not table:
+        return table, np.zeros(np.shape(deviations)[:-1] + (0,), dtype=bool)
+    joints = np.array([KEYPOINTS[r["joint"]] for r in table])
+    thresholds = np.array([r["threshold"] for r in table])
+    return table, np.asarray(deviations)[..., joints] > thresholds
@@ -0,0 +1,228 @@
+# pose_estimation/reference_library.py
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from pose_estimation.dtw import load_sequence
+from pose_estimation.pose_compare import normalize_poses, pose_distances
+
+REFERENCE_DIR = Path(__file__).resolve().parent / "reference_poses"
+# The pack is a build artifact: it lives in the data cache, never next to the package sources
+LIBRARY_DIR = Path(__file__).resolve().parent.parent / "data" / "cache" / "reference_library"
+INDEX_NAME = "library.json"
+# Packs replaced longer ago than this are deleted; newer ones may still be mapped by a reader
+OLD_PACK_SECONDS = 60
+
+
+def _source_files(ref_dir):
+    """
+    Reference pose sources as (stroke, path, is_sequence). There is one
+    reference tree for both matchers, with two kinds of files:
+
+    - `reference_poses/<stroke>/*.npy`: (T, 33, 4) stroke sequences, frame
+      order matters. The DTW (pose_estimation/dtw.py) aligns against the
+      whole sequence; the k-NN library only takes its contact frame.
+    - `reference_poses/<stroke>.npy` and `reference_poses/library/<stroke>/*.npy`:
+      unordered contact poses, one (33, 4) pose or an (M, 33, 4) stack.
+    """
+    ref_dir = Path(ref_dir)
+    # library.npy is what older checkouts packed in here, not a stroke
+    files = [(f.stem, f, False) for f in sorted(ref_dir.glob("*.npy")) if f.name != "library.npy"]
+    for stroke_dir in sorted(p for p in ref_dir.iterdir() if p.is_dir() and p.name != "library"):
+        files.extend((stroke_dir.name, f, True) for f in sorted(stroke_dir.glob("*.npy")))
+    library_dir = ref_dir / "library"
+    if library_dir.is_dir():
+        for stroke_dir in sorted(p for p in library_dir.iterdir() if p.is_dir()):
+            files.extend((stroke_dir.name, f, False) for f in sorted(stroke_dir.glob("*.npy")))
+    return files
+
+
+def _source_mtimes(ref_dir):
+    """{relative path: mtime} of every source, including the contact sidecars of sequences."""
+    ref_dir = Path(ref_dir)
+    mtimes = {}
+    for _, path, is_sequence in _source_files(ref_dir):
+        mtimes[path.relative_to(ref_dir).as_posix()] = os.path.getmtime(path)
+        sidecar = path.with_suffix(".json")
+        if is_sequence and sidecar.exists():
+            mtimes[sidecar.relative_to(ref_dir).as_posix()] = os.path.getmtime(sidecar)
+    return mtimes
+
+
+def _remove_old_packs(out_dir, keep):
+    for pack in Path(out_dir).glob("library-*.npy"):
+        try:
+            if pack.name != keep and time.time() - pack.stat().st_mtime > OLD_PACK_SECONDS:
+                pack.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def build_library(ref_dir=REFERENCE_DIR, out_dir=LIBRARY_DIR):
+    """
+    Packs every reference pose into one normalized float32 (M, 33, 4) matrix,
+    grouped by stroke so each stroke is a contiguous slice, plus a JSON index.
+
+    Each build writes a new uniquely named pack and then swaps the index in
+    with one atomic rename, so readers in other processes always see a
+    matching index and pack.
+    """
+    ref_dir = Path(ref_dir)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    by_stroke = {}
+    for stroke_type, path, is_sequence in _source_files(ref_dir):
+        if is_sequence:
+            seq, contact = load_sequence(path)
+            poses = seq[contact:contact + 1]
+        else:
+            poses = np.load(path)
+            poses = poses[None] if poses.ndim == 2 else poses
+            poses = poses[~np.isnan(poses).any(axis=(1, 2))]
+        rel = path.relative_to(ref_dir).as_posix()
+        for i in range(len(poses)):
+            by_stroke.setdefault(stroke_type, []).append((f"{rel}#{i}", poses[i]))
+
+    names, strokes, packed = [], {}, []
+    for stroke_type in sorted(by_stroke):
+        start = len(names)
+        for name, pose in by_stroke[stroke_type]:
+            names.append(name)
+            packed.append(pose)
+        strokes[stroke_type] = [start, len(names)]
+
+    matrix = normalize_poses(np.array(packed).reshape(-1, 33, 4)).astype(np.float32)
+
+    pack_name = f"library-{os.getpid()}-{time.time_ns()}.npy"
+    with open(out_dir / pack_name, "wb") as f:
+        np.save(f, matrix)
+    index = {"ref_dir": str(ref_dir.resolve()), "packed": pack_name, "strokes": strokes,
+             "names": names, "sources": _source_mtimes(ref_dir)}
+    tmp_json = out_dir / f".{INDEX_NAME}.{os.getpid()}.tmp"
+    with open(tmp_json, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_json, out_dir / INDEX_NAME)
+    _remove_old_packs(out_dir, keep=pack_name)
+    return len(names)
+
+
+def _read_index(out_dir):
+    with open(Path(out_dir) / INDEX_NAME, "r") as f:
+        return json.load(f)
+
+
+def _is_stale(ref_dir, out_dir):
+    try:
+        index = _read_index(out_dir)
+    except FileNotFoundError:
+        return True
+    return (index.get("ref_dir") != str(Path(ref_dir).resolve())
+            or not (Path(out_dir) / index["packed"]).exists()
+            or index["sources"] != _source_mtimes(ref_dir))
+
+
+class ReferenceLibrary:
+    """
+    Memory-mapped library of normalized reference poses with k-NN lookup.
+
+    `load()` rebuilds the packed file when the sources changed, then maps it
+    read-only instead of reading every source file. `nearest()` returns
+    the k references of a stroke closest to a pose by visibility-weighted RMS
+    joint distance (the same frame cost the DTW uses).
+    """
+
+    def __init__(self, matrix, strokes, names):
+        self.matrix = matrix
+        self.strokes = strokes
+        self.names = names
+        self._feat = np.ascontiguousarray(matrix[..., :2], dtype=np.float64)
+        self._vis = np.ascontiguousarray(matrix[..., 3], dtype=np.float64)
+
+    @classmethod
+    def load(cls, ref_dir=REFERENCE_DIR, out_dir=LIBRARY_DIR, rebuild=True):
+        out_dir = Path(out_dir)
+        for attempt in range(2):
+            if rebuild and _is_stale(ref_dir, out_dir):
+                build_library(ref_dir, out_dir)
+            index = _read_index(out_dir)
+            try:
+                matrix = np.load(out_dir / index["packed"], mmap_mode="r")
+            except FileNotFoundError:
+                # another process swapped in a newer pack between reading the index and mapping it
+                if attempt or not rebuild:
+                    raise
+                continue
+            return cls(matrix, {k: tuple(v) for k, v in index["strokes"].items()}, index["names"])
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, stroke_type):
+        return stroke_type in self.strokes
+
+    def poses(self, stroke_type):
+        start, end = self.strokes.get(stroke_type, (0, 0))
+        return self.matrix[start:end]
+
+    def nearest(self, stroke_type, pose, k=1):
+        """
+        k nearest references of `stroke_type` to a (33, 4) pose.
+        Returns (names, (k, 33, 4) normalized poses, distances), closest first.
+        """
+        if stroke_type not in self.strokes:
+            return [], np.empty((0, 33, 4), dtype=np.float32), np.empty(0)
+        start, end = self.strokes[stroke_type]
+        query = normalize_poses(np.asarray(pose)[None])
+        dist = pose_distances(query[..., :2], query[..., 3], self._feat[start:end], self._vis[start:end])[0]
+
+        k = min(k, end - start)
+        order = np.argpartition(dist, k - 1)[:k] if k < len(dist) else np.arange(len(dist))
+        order = order[np.argsort(dist[order])]
+        return [self.names[start + i] for i in order], np.asarray(self.matrix[start + order]), dist[order]
+
+
+def source_state(ref_dir=REFERENCE_DIR):
+    """(relative path, size, mtime) of every reference source; changes whenever a reference does."""
+    ref_dir = Path(ref_dir)
+    state = []
+    for rel in sorted(_source_mtimes(ref_dir)):
+        st = (ref_dir / rel).stat()
+        state.append((rel, st.st_size, st.st_mtime))
+    return tuple(state)
+
+
+_default_library = None
+_default_state = None
+
+
+def get_reference_library():
+    """
+    Shared library for the default reference directory. Long-lived workers
+    reload it when a reference source is added, removed or edited.
+    """
+    global _default_library, _default_state
+    state = source_state()
+    if _default_library is None or state != _default_state:
+        _default_library = ReferenceLibrary.load()
+        _default_state = state
+    return _default_library
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack reference poses into a memory-mapped library.")
+    parser.add_argument("--ref-dir", default=str(REFERENCE_DIR), help="Reference pose directory")
+    parser.add_argument("--out-dir", default=str(LIBRARY_DIR),
+                        help="Where the pack is written (default: data/cache/reference_library)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = build_library(args.ref_dir, args.out_dir)
+    library = ReferenceLibrary.load(args.ref_dir, args.out_dir, rebuild=False)
+    print(f"[✅] Packed {count} reference poses in {time.perf_counter() - start:.2f}s")
+    for stroke_type, (lo, hi) in library.strokes.items():
+        print(f"  - {stroke_type}: {hi - lo}")
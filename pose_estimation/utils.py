@@ -4,33 +4,98 @@ import cv2
 import numpy as np
 import mediapipe as mp
 
+from src.metrics import NULL_METRICS
+
 mp_pose = mp.solutions.pose
 mp_drawing = mp.solutions.drawing_utils
 
-def run_pose_estimation_from_array(image_array):
+NUM_LANDMARKS = 33
+
+
+class PoseEngine:
     """
-    Runs pose estimation on a given numpy array image.
-    Returns keypoints as numpy array, and annotated image.
+    Long-lived MediaPipe pose graph, built once and reused across calls.
+
+    With static_image_mode=True every image is processed independently.
+    With static_image_mode=False landmarks are tracked across consecutive
+    frames of the same clip, which is faster and steadier for video.
+
+    An optional `metrics` (src.metrics.Metrics) gets "pose.*" spans and
+    counters of frames processed and poses found.
     """
-    pose = mp_pose.Pose(static_image_mode=True)
-    image_rgb = cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB)
-    results = pose.process(image_rgb)
 
-    keypoints = []
-    if results.pose_landmarks:
-        h, w, _ = image_array.shape
-        for lm in results.pose_landmarks.landmark:
-            keypoints.append((lm.x, lm.y, lm.z, lm.visibility))
+    def __init__(self, static_image_mode=True, metrics=None, **pose_kwargs):
+        self.static_image_mode = static_image_mode
+        self.metrics = metrics or NULL_METRICS
+        self.pose = mp_pose.Pose(static_image_mode=static_image_mode, **pose_kwargs)
+
+    def _landmarks(self, image_array):
+        image_rgb = cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB)
+        return self.pose.process(image_rgb).pose_landmarks
 
+    def process(self, image_array, metrics=None):
+        """
+        Runs pose estimation on one BGR image.
+        Returns the annotated image and a (33, 4) keypoint array (empty if no pose).
+        """
+        metrics = metrics or self.metrics
+        with metrics.span("pose.image"):
+            landmarks = self._landmarks(image_array)
+        metrics.count("pose.frames")
         annotated = image_array.copy()
+        if not landmarks:
+            return annotated, np.array([])
+        metrics.count("pose.found")
+
+        keypoints = np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks.landmark])
         mp_drawing.draw_landmarks(
-            annotated, results.pose_landmarks, mp_pose.POSE_CONNECTIONS,
+            annotated, landmarks, mp_pose.POSE_CONNECTIONS,
             landmark_drawing_spec=mp_drawing.DrawingSpec(color=(0, 0, 255), thickness=2, circle_radius=3),
             connection_drawing_spec=mp_drawing.DrawingSpec(color=(255, 255, 255), thickness=2)
         )
-    else:
-        annotated = image_array.copy()
-        keypoints = []
+        return annotated, keypoints
+
+    def process_batch(self, images):
+        """
+        Runs pose estimation on a list of BGR frames or crops.
+        Returns an (N, 33, 4) float32 array; rows without a pose are NaN.
+        """
+        keypoints = np.full((len(images), NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+        found = 0
+        with self.metrics.span("pose.batch"):
+            for i, image in enumerate(images):
+                landmarks = self._landmarks(image)
+                if landmarks:
+                    keypoints[i] = [(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks.landmark]
+                    found += 1
+        self.metrics.count("pose.frames", len(images))
+        self.metrics.count("pose.found", found)
+        return keypoints
+
+    def close(self):
+        self.pose.close()
 
-    pose.close()
-    return annotated, np.array(keypoints)
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default_engine = None
+
+
+def get_pose_engine():
+    """Shared static-image engine, created on first use."""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = PoseEngine(static_image_mode=True)
+    return _default_engine
+
+
+def run_pose_estimation_from_array(image_array, metrics=None):
+    """
+    Runs pose estimation on a given numpy array image.
+    Returns keypoints as numpy array, and annotated image.
+    """
+    return get_pose_engine().process(image_array, metrics=metrics)
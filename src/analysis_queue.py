@@ -0,0 +1,109 @@
+# src/analysis_queue.py
+
+import os
+import sys
+import time
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+# Per-worker state, filled once by init_worker
+_models = None
+_progress = None
+
+
+def default_workers():
+    """Half the cores: each worker runs its own multi-threaded inference."""
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def init_worker(classifier_backend, progress, threads):
+    """Loads the models once per worker process and keeps them warm."""
+    global _models, _progress
+    import torch
+    from src.video_pipeline import load_models
+
+    if threads:
+        torch.set_num_threads(threads)
+    _models = load_models(classifier_backend)
+    _progress = progress
+
+
+def run_job(job_id, video_path, options, video_hash=None):
+    from src.video_pipeline import analyze_video, default_options
+
+    def report(fraction, message):
+        _progress[job_id] = {"progress": fraction, "message": message}
+
+    report(0.0, "Starting")
+    return analyze_video(video_path, options=default_options(**options), models=_models, progress=report,
+                         video_hash=video_hash)
+
+
+class AnalysisQueue:
+    """
+    Local job queue backed by a pool of warm analysis workers.
+
+    Every worker loads YOLO and the classifier once at start-up, then runs
+    analyze_video() for each job it picks up. `submit()` returns a job id
+    right away; `status()` reports the job's state, progress and result.
+    """
+
+    def __init__(self, workers=None, classifier_backend="eager"):
+        self.workers = workers or default_workers()
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._progress = self._manager.dict()
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=init_worker,
+            initargs=(classifier_backend, self._progress, threads),
+        )
+        self._jobs = {}
+
+    def submit(self, video_path, video_hash=None, **options):
+        """Queues one video; pass `video_hash` if the caller already hashed it."""
+        job_id = uuid.uuid4().hex[:12]
+        self._progress[job_id] = {"progress": 0.0, "message": "Queued"}
+        future = self._executor.submit(run_job, job_id, str(video_path), options, video_hash)
+        self._jobs[job_id] = {"video": str(video_path), "submitted": time.time(), "future": future}
+        return job_id
+
+    def __contains__(self, job_id):
+        return job_id in self._jobs
+
+    def status(self, job_id):
+        job = self._jobs[job_id]
+        future = job["future"]
+        info = {"job_id": job_id, "video": job["video"], "submitted": job["submitted"]}
+        info.update(self._progress.get(job_id, {}))
+
+        if future.done():
+            error = future.exception()
+            if error is not None:
+                info.update(state="failed", error=str(error))
+            else:
+                info.update(state="done", result=future.result(), progress=1.0)
+        elif future.running() and info.get("message") != "Queued":
+            info["state"] = "running"
+        else:
+            info["state"] = "queued"
+        return info
+
+    def jobs(self):
+        return [self.status(job_id) for job_id in self._jobs]
+
+    def forget(self, job_id):
+        self._jobs.pop(job_id, None)
+        self._progress.pop(job_id, None)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        self._manager.shutdown()
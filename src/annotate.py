@@ -0,0 +1,66 @@
+# src/annotate.py
+
+import time
+
+import cv2
+
+from src.detection import ball_in_box
+
+
+class FrameAnnotator:
+    """
+    Per-frame drawing and contact detection, in frame order.
+
+    Draws the detection boxes and the ball trajectory, keeps the raw frame
+    in the contact buffer, marks the first frame where the ball center is
+    inside the batsman box, and hands the annotated frame to `writer`.
+    """
+
+    def __init__(self, names, writer, frame_buffer, trajectory):
+        self.names = names
+        self.writer = writer
+        self.frame_buffer = frame_buffer
+        self.trajectory = trajectory
+        self.ball_centers = []
+        self.contact_frame_idx = -1
+        self.batsman_box_at_contact = None
+        self.write_seconds = 0.0
+        self.frames_with_ball = 0
+        self.frames_with_batsman = 0
+
+    def process(self, frame_idx, frame, detections, interpolated=False):
+        self.frame_buffer.push(frame_idx, frame)
+        ball_detected = False
+        batsman_box = None
+
+        for box in detections.tolist():
+            x1, y1, x2, y2, conf, cls = box
+            cls = int(cls)
+            label = self.names[cls]
+            color = (0, 255, 0) if label == 'ball' else (255, 0, 0)
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
+            cv2.putText(frame, label, (int(x1), int(y1) - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+            if label == "ball":
+                cx, cy = int((x1 + x2) / 2), int((y1 + y2) / 2)
+                self.ball_centers.append((frame_idx, cx, cy))
+                self.trajectory.add_point(cx, cy)
+                ball_detected = True
+            if label == "batsman":
+                batsman_box = (int(x1), int(y1), int(x2), int(y2))
+
+        self.frames_with_ball += ball_detected
+        self.frames_with_batsman += batsman_box is not None
+
+        # Contact is only decided on frames the detector actually saw
+        if self.contact_frame_idx == -1 and not interpolated and ball_detected and batsman_box:
+            if ball_in_box(self.ball_centers[-1][1:], batsman_box):
+                self.contact_frame_idx = frame_idx
+                self.batsman_box_at_contact = batsman_box
+                self.frame_buffer.promote(frame_idx)
+                cv2.putText(frame, "🎯 Contact Point", (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3)
+
+        self.trajectory.composite(frame)
+        start = time.perf_counter()
+        self.writer.write(frame)
+        self.write_seconds += time.perf_counter() - start
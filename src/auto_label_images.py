@@ -1,41 +1,116 @@
 import os
-from ultralytics import YOLO
-from PIL import Image
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-# Load your trained YOLOv8 model
-model = YOLO("models/yolov8_ball.pt")  
+import cv2
+from ultralytics import YOLO
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.fs_utils import link_or_copy
 
 # Define input and output directories
+MODEL_PATH = Path("models/yolov8_ball.pt")
 input_root = Path("data/frames")                 # Unlabeled frames
 output_root = Path("data/autolabeled_frames")    # Output location
-output_root.mkdir(parents=True, exist_ok=True)   # Create output if not exists
-
-# Loop through each folder 
-for subfolder in input_root.iterdir():
-    if subfolder.is_dir():
-        # Output subfolders (images + labels)
-        output_img_dir = output_root / subfolder.name
-        output_lbl_dir = output_img_dir / "labels"
-        output_img_dir.mkdir(parents=True, exist_ok=True)
-        output_lbl_dir.mkdir(parents=True, exist_ok=True)
-
-        # Loop through each image in this folder
-        for image_file in subfolder.glob("*.jpg"):
-            results = model(image_file)       # Run inference on image
-            result = results[0]               # Get prediction result
-            boxes = result.boxes              # Get bounding boxes
-
-            # Create YOLO label file
-            label_path = output_lbl_dir / f"{image_file.stem}.txt"
-            with open(label_path, "w") as f:
-                for box in boxes:
-                    cls_id = int(box.cls[0].item())           # Class ID
-                    xywhn = box.xywhn[0].tolist()             # [x_center, y_center, width, height] (normalized)
-                    f.write(f"{cls_id} {' '.join(f'{v:.6f}' for v in xywhn)}\n")
-
-            # Copy image to output directory
-            img = Image.open(image_file)
-            img.save(output_img_dir / image_file.name)
-
-print(" Auto-labeling complete for all images.")
+BATCH_SIZE = 32
+
+
+def is_up_to_date(image_file, label_path, output_image, model_mtime):
+    """A label newer than the weights, next to an already placed image, needs no rerun."""
+    return (label_path.exists() and label_path.stat().st_mtime > model_mtime
+            and output_image.exists() and output_image.stat().st_size == image_file.stat().st_size)
+
+
+def write_label(label_path, result):
+    """YOLO label file: one `cls x_center y_center width height` (normalized) line per box."""
+    boxes = result.boxes
+    classes = boxes.cls.int().tolist()
+    xywhn = boxes.xywhn.tolist()
+    tmp_path = label_path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        for cls_id, box in zip(classes, xywhn):
+            f.write(f"{cls_id} {' '.join(f'{v:.6f}' for v in box)}\n")
+    # replace only once written, so an interrupted run never leaves a partial label
+    os.replace(tmp_path, label_path)
+
+
+def label_folder(model, subfolder, batch_size, model_mtime, readers, force=False):
+    """Labels one frame folder. Returns (images labelled, images skipped)."""
+    # Output subfolders (images + labels)
+    output_img_dir = output_root / subfolder.name
+    output_lbl_dir = output_img_dir / "labels"
+    output_img_dir.mkdir(parents=True, exist_ok=True)
+    output_lbl_dir.mkdir(parents=True, exist_ok=True)
+
+    todo = []
+    skipped = 0
+    for image_file in sorted(subfolder.glob("*.jpg")):
+        label_path = output_lbl_dir / f"{image_file.stem}.txt"
+        output_image = output_img_dir / image_file.name
+        if not force and is_up_to_date(image_file, label_path, output_image, model_mtime):
+            skipped += 1
+        else:
+            todo.append((image_file, label_path, output_image))
+
+    chunks = [todo[start:start + batch_size] for start in range(0, len(todo), batch_size)]
+
+    def decode(chunk):
+        # cv2 releases the GIL while decoding, so the threads run alongside inference
+        return [readers.submit(cv2.imread, str(item[0])) for item in chunk]
+
+    pending = decode(chunks[0]) if chunks else []
+    for i, chunk in enumerate(chunks):
+        images = [f.result() for f in pending]
+        # queue the next batch's decode before running inference on this one
+        pending = decode(chunks[i + 1]) if i + 1 < len(chunks) else []
+        loaded = [(item, img) for item, img in zip(chunk, images) if img is not None]
+        if not loaded:
+            continue
+        results = model([img for _, img in loaded], verbose=False)
+        for ((image_file, label_path, output_image), _), result in zip(loaded, results):
+            write_label(label_path, result)
+            # Link the original JPEG instead of decoding and re-encoding it
+            link_or_copy(image_file, output_image)
+    return len(todo), skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Auto-label extracted frames with the YOLO model.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Images per inference call (default: {BATCH_SIZE})")
+    parser.add_argument("--force", action="store_true",
+                        help="Relabel every image, even if its label is newer than the model")
+    args = parser.parse_args(argv)
+
+    # Load your trained YOLOv8 model
+    model = YOLO(str(MODEL_PATH))
+    model_mtime = MODEL_PATH.stat().st_mtime
+    output_root.mkdir(parents=True, exist_ok=True)   # Create output if not exists
+
+    labelled = skipped = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as readers:
+        # Loop through each folder
+        for subfolder in sorted(input_root.iterdir()):
+            if subfolder.suffix == ".zip":
+                print(f"[⚠️] Skipping {subfolder.name}: extract frames without --archive to label them")
+            if not subfolder.is_dir():
+                continue
+            done, up_to_date = label_folder(model, subfolder, args.batch_size, model_mtime, readers, args.force)
+            labelled += done
+            skipped += up_to_date
+            if done:
+                print(f"[✅] {subfolder.name}: {done} labelled, {up_to_date} up to date")
+
+    elapsed = time.perf_counter() - start
+    rate = labelled / elapsed if elapsed > 0 else 0.0
+    print(f"[📈] Labelled {labelled} images in {elapsed:.1f}s ({rate:.1f} img/s), {skipped} already up to date.")
+    print(" Auto-labeling complete for all images.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# src/batch_analyze.py
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from src.analysis_queue import default_workers, init_worker, run_job
+from src.fs_utils import load_manifest, save_manifest
+
+DEFAULT_MANIFEST = ROOT_DIR / "data" / "outputs" / "batch_manifest.json"
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv")
+# Pool rebuilds after a worker dies (segfault, OOM kill) before giving up for this run
+MAX_POOL_RESTARTS = 3
+
+
+def find_videos(inputs):
+    """Videos from directories (searched recursively), glob patterns and plain file paths."""
+    videos = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for dirpath, _, files in os.walk(item):
+                videos.update(os.path.join(dirpath, f) for f in files if f.lower().endswith(VIDEO_EXTENSIONS))
+        elif glob.has_magic(item):
+            videos.update(p for p in glob.glob(item, recursive=True) if p.lower().endswith(VIDEO_EXTENSIONS))
+        elif os.path.isfile(item):
+            videos.add(item)
+        else:
+            print(f"[⚠️] Not found: {item}")
+    return sorted(os.path.abspath(v) for v in videos)
+
+
+def _file_state(video):
+    st = os.stat(video)
+    return {"size": st.st_size, "mtime": st.st_mtime}
+
+
+def pending_videos(videos, manifest, retry_failed=False, force=False):
+    """
+    Videos still to analyze: new or changed (size/mtime) ones, ones a crash
+    left unfinished, and failed ones with `retry_failed`.
+    """
+    pending = []
+    for video in videos:
+        entry = manifest.get(video)
+        if force or entry is None or entry.get("status") not in ("done", "failed"):
+            pending.append(video)
+        elif {k: entry.get(k) for k in ("size", "mtime")} != _file_state(video):
+            pending.append(video)
+        elif entry["status"] == "failed" and retry_failed:
+            pending.append(video)
+    return pending
+
+
+def _clip_result(summary):
+    return {
+        "stroke_type": summary["stroke_type"],
+        "confidence": summary["confidence"],
+        "contact_found": summary["contact_frame_idx"] != -1,
+        "contact_frame_idx": summary["contact_frame_idx"],
+        "output_dir": summary["output_dir"],
+        "cache": summary.get("cache"),
+    }
+
+
+# ========== RUN ==========
+def _new_executor(workers, classifier_backend, threads):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=init_worker, initargs=(classifier_backend, {}, threads))
+
+
+def run_batch(videos, manifest, manifest_path, options, workers=None, classifier_backend="eager"):
+    """
+    Analyzes `videos` on a pool of warm workers (models loaded once per
+    process). The manifest is saved after every clip, so an interrupted
+    run resumes with what is left.
+
+    Only an exception raised by a clip's own analysis marks it "failed". If
+    a worker process dies, the pool is rebuilt and the clips it took down
+    are resubmitted; after MAX_POOL_RESTARTS they stay "pending" for the
+    next run.
+    """
+    workers = max(1, min(workers or default_workers(), len(videos)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"[📦] Analyzing {len(videos)} clip(s) on {workers} worker(s), {threads} thread(s) each")
+
+    for video in videos:
+        manifest[video] = dict(_file_state(video), status="pending", submitted=None)
+    save_manifest(manifest_path, manifest)
+
+    started = time.perf_counter()
+    done = 0
+    remaining = list(videos)
+    for attempt in range(MAX_POOL_RESTARTS + 1):
+        if attempt:
+            print(f"[♻️] A worker process died; restarting the pool for {len(remaining)} clip(s) "
+                  f"({attempt}/{MAX_POOL_RESTARTS})")
+        executor = _new_executor(workers, classifier_backend, threads)
+        crashed = []
+        try:
+            futures = {}
+            for video in remaining:
+                # the absolute path is unique, unlike the file name
+                futures[executor.submit(run_job, video, video, options)] = video
+                manifest[video]["submitted"] = datetime.now().isoformat(timespec="seconds")
+
+            for future in as_completed(futures):
+                video = futures[future]
+                entry = manifest[video]
+                try:
+                    summary = future.result()
+                except BrokenProcessPool:
+                    crashed.append(video)
+                    continue
+                except Exception as e:
+                    entry.update(status="failed", error=f"{type(e).__name__}: {e}")
+                else:
+                    entry.update(status="done", error=None, result=_clip_result(summary),
+                                 duration_s=summary["metrics"].get("duration_s"))
+                entry["finished"] = datetime.now().isoformat(timespec="seconds")
+                save_manifest(manifest_path, manifest)
+
+                done += 1
+                icon = "✅" if entry["status"] == "done" else "❌"
+                detail = entry["result"]["stroke_type"] if entry["status"] == "done" else entry["error"]
+                print(f"[{icon}] {done}/{len(videos)} {os.path.basename(video)}: {detail}")
+        except KeyboardInterrupt:
+            print("[⚠️] Interrupted; finished clips are recorded, rerun the same command to resume.")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown(wait=not crashed)
+        remaining = crashed
+        if not remaining:
+            break
+    if remaining:
+        print(f"[⚠️] {len(remaining)} clip(s) left pending after repeated worker crashes; "
+              "rerun the same command to resume.")
+
+    elapsed = time.perf_counter() - started
+    print(f"[📈] {done} clip(s) in {elapsed:.1f}s ({elapsed / max(done, 1):.1f}s per clip)")
+
+
+# ========== SUMMARY ==========
+def summarize(videos, manifest, csv_path=None):
+    """Prints one row per clip and returns the rows; optionally also writes them as CSV."""
+    rows = []
+    for video in videos:
+        entry = manifest.get(video, {})
+        result = entry.get("result") or {}
+        confidence = result.get("confidence")
+        rows.append({
+            "video": video,
+            "status": entry.get("status", "pending"),
+            "stroke_type": result.get("stroke_type", "-"),
+            "confidence": f"{confidence * 100:.1f}%" if confidence is not None else "-",
+            "contact": ("yes" if result["contact_found"] else "no") if result else "-",
+            "output_dir": result.get("output_dir", ""),
+            "error": entry.get("error") or "",
+        })
+
+    width = max([len(os.path.basename(r["video"])) for r in rows] + [4]) + 2
+    print(f"{'clip':<{width}}{'status':<9}{'stroke':<22}{'conf':>8}{'contact':>9}")
+    for r in rows:
+        print(f"{os.path.basename(r['video']):<{width}}{r['status']:<9}{r['stroke_type']:<22}"
+              f"{r['confidence']:>8}{r['contact']:>9}" + (f"  {r['error']}" if r["error"] else ""))
+
+    counts = {}
+    for r in rows:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    contact = sum(r["contact"] == "yes" for r in rows)
+    print(f"[📈] {len(rows)} clip(s): " + ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+          + f"; contact found in {contact}")
+
+    if csv_path:
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["video"])
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"[✅] Summary saved at {csv_path}")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze every batting video in directories or glob patterns.")
+    parser.add_argument("inputs", nargs="+", help="Video directories (searched recursively), globs or files")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"Analysis processes, each with its own models (default: {default_workers()})")
+    parser.add_argument("--manifest", default=str(DEFAULT_MANIFEST),
+                        help="Per-clip status file used to resume (default: data/outputs/batch_manifest.json)")
+    parser.add_argument("--options", default="{}",
+                        help='Pipeline option overrides as JSON, e.g. \'{"stride": 5, "roi": true}\'')
+    parser.add_argument("--retry-failed", action="store_true", help="Also re-run clips that failed before")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-run every clip, even finished ones (the result cache still applies)")
+    parser.add_argument("--summary-csv", default=None, help="Also write the per-clip summary as CSV")
+    args = parser.parse_args(argv)
+
+    options = json.loads(args.options)
+    if options.get("replay"):
+        print("[❌] --replay is per clip; use src/video_pipeline.py for replays.")
+        sys.exit(1)
+    videos = find_videos(args.inputs)
+    if not videos:
+        print("[❌] No videos found.")
+        sys.exit(1)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.manifest)), exist_ok=True)
+    manifest = load_manifest(args.manifest)
+    pending = pending_videos(videos, manifest, args.retry_failed, args.force)
+    if len(pending) < len(videos):
+        print(f"[♻️] {len(videos) - len(pending)} of {len(videos)} clip(s) already in {args.manifest}")
+    if pending:
+        run_batch(pending, manifest, args.manifest, options, args.workers,
+                  options.get("classifier_backend", "eager"))
+    rows = summarize(videos, manifest, args.summary_csv)
+    sys.exit(0 if all(r["status"] == "done" for r in rows) else 1)
+
+
+if __name__ == "__main__":
+    main()
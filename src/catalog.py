@@ -0,0 +1,248 @@
+# src/catalog.py
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+DEFAULT_CATALOG_PATH = ROOT_DIR / "data" / "catalog.sqlite"
+DEFAULT_OUTPUT_ROOT = ROOT_DIR / "data" / "outputs"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    output_dir TEXT NOT NULL UNIQUE,
+    video_name TEXT NOT NULL,
+    video_hash TEXT,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    day TEXT NOT NULL,
+    stroke_type TEXT NOT NULL,
+    confidence REAL,
+    suggestions TEXT NOT NULL,
+    contact_frame_idx INTEGER,
+    annotated_video TEXT,
+    contact_pose_image TEXT,
+    duration_s REAL,
+    frames INTEGER
+);
+CREATE INDEX IF NOT EXISTS analyses_last_access ON analyses (last_access);
+CREATE INDEX IF NOT EXISTS analyses_hash ON analyses (video_hash);
+
+-- Aggregates are updated in the same transaction as each insert, so the
+-- history view never has to scan `analyses`. They keep counting analyses
+-- whose outputs were later evicted.
+CREATE TABLE IF NOT EXISTS stroke_totals (
+    stroke_type TEXT PRIMARY KEY,
+    n INTEGER NOT NULL,
+    confidence_sum REAL NOT NULL,
+    confidence_n INTEGER NOT NULL,
+    duration_sum REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_totals (
+    day TEXT NOT NULL,
+    stroke_type TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    confidence_sum REAL NOT NULL,
+    confidence_n INTEGER NOT NULL,
+    PRIMARY KEY (day, stroke_type)
+);
+"""
+
+
+def _existing(path):
+    return str(path) if path is not None and Path(path).exists() else None
+
+
+class Catalog:
+    """
+    SQLite index of finished analyses.
+
+    One row per output directory (paths, stroke type, confidence,
+    suggestions, timings and the video's content hash), plus per-stroke and
+    per-day totals maintained incrementally, so the app's pages are single
+    indexed queries no matter how many analyses are on disk.
+    """
+
+    def __init__(self, path=DEFAULT_CATALOG_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(str(self.path), timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    # === Writes ===
+    def record(self, summary, video_name, video_hash=None, created=None):
+        """
+        Adds one finished analysis from analyze_video()'s summary. If its
+        output directory is already catalogued (a cache hit), only moves it
+        to the front of the recent list and returns False.
+        """
+        output_dir = Path(summary["output_dir"]).resolve()
+        metrics = summary.get("metrics") or {}
+        created = created if created is not None else time.time()
+        day = datetime.fromtimestamp(created).strftime("%Y-%m-%d")
+        stroke_type = summary.get("stroke_type") or "unknown"
+        confidence = summary.get("confidence")
+        duration = metrics.get("duration_s")
+
+        with self._connect() as db:
+            inserted = db.execute(
+                """INSERT INTO analyses (output_dir, video_name, video_hash, created, last_access, day,
+                                         stroke_type, confidence, suggestions, contact_frame_idx,
+                                         annotated_video, contact_pose_image, duration_s, frames)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (output_dir) DO NOTHING""",
+                (str(output_dir), video_name, video_hash, created, created, day, stroke_type, confidence,
+                 json.dumps(summary.get("suggestions", [])), summary.get("contact_frame_idx"),
+                 _existing(output_dir / "annotated_video_streamlit.mp4"),
+                 _existing(output_dir / "contact_frame_pose.jpg"), duration, metrics.get("frames")),
+            ).rowcount
+            if not inserted:
+                db.execute("UPDATE analyses SET last_access = ? WHERE output_dir = ?", (created, str(output_dir)))
+                return False
+
+            has_conf = int(confidence is not None)
+            db.execute(
+                """INSERT INTO stroke_totals VALUES (?, 1, ?, ?, ?, ?)
+                   ON CONFLICT (stroke_type) DO UPDATE SET
+                       n = n + 1,
+                       confidence_sum = confidence_sum + excluded.confidence_sum,
+                       confidence_n = confidence_n + excluded.confidence_n,
+                       duration_sum = duration_sum + excluded.duration_sum,
+                       last_seen = MAX(last_seen, excluded.last_seen)""",
+                (stroke_type, confidence or 0.0, has_conf, duration or 0.0, created),
+            )
+            db.execute(
+                """INSERT INTO daily_totals VALUES (?, ?, 1, ?, ?)
+                   ON CONFLICT (day, stroke_type) DO UPDATE SET
+                       n = n + 1,
+                       confidence_sum = confidence_sum + excluded.confidence_sum,
+                       confidence_n = confidence_n + excluded.confidence_n""",
+                (day, stroke_type, confidence or 0.0, has_conf),
+            )
+        return True
+
+    def remove(self, output_dirs):
+        """Drops rows whose output directories were deleted; totals are kept as history."""
+        with self._connect() as db:
+            db.executemany("DELETE FROM analyses WHERE output_dir = ?",
+                           [(str(Path(d).resolve()),) for d in output_dirs])
+
+    # === Reads ===
+    def latest(self):
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM analyses ORDER BY last_access DESC LIMIT 1").fetchone()
+        return self._as_dict(row)
+
+    def recent(self, limit=50, offset=0, with_video=True):
+        query = "SELECT * FROM analyses"
+        if with_video:
+            query += " WHERE annotated_video IS NOT NULL"
+        query += " ORDER BY last_access DESC LIMIT ? OFFSET ?"
+        with self._connect() as db:
+            rows = db.execute(query, (limit, offset)).fetchall()
+        return [self._as_dict(r) for r in rows]
+
+    def count(self):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def stroke_distribution(self):
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT stroke_type, n, confidence_sum, confidence_n, duration_sum "
+                "FROM stroke_totals ORDER BY n DESC"
+            ).fetchall()
+        return [{
+            "stroke_type": r["stroke_type"],
+            "count": r["n"],
+            "avg_confidence": r["confidence_sum"] / r["confidence_n"] if r["confidence_n"] else None,
+            "avg_duration_s": r["duration_sum"] / r["n"],
+        } for r in rows]
+
+    def confidence_trend(self, days=90):
+        """Per-day analysis count and mean confidence over the last `days` days with data."""
+        with self._connect() as db:
+            rows = db.execute(
+                """SELECT day, SUM(n) AS n, SUM(confidence_sum) AS cs, SUM(confidence_n) AS cn
+                   FROM daily_totals GROUP BY day ORDER BY day DESC LIMIT ?""",
+                (days,),
+            ).fetchall()
+        return [{"day": r["day"], "count": r["n"], "avg_confidence": r["cs"] / r["cn"] if r["cn"] else None}
+                for r in reversed(rows)]
+
+    @staticmethod
+    def _as_dict(row):
+        if row is None:
+            return None
+        item = dict(row)
+        item["suggestions"] = json.loads(item["suggestions"])
+        return item
+
+
+# === Backfill ===
+# <video>_<YYYYmmdd>_<HHMMSS>, with a random 8-hex suffix since outputs got one
+_OUTPUT_DIR_NAME = re.compile(r"(.+)_\d{8}_\d{6}(?:_[0-9a-f]{8})?$")
+
+
+def video_name_from_dir(name):
+    """Video name of an output directory for runs whose metrics.json predates the "video" field."""
+    match = _OUTPUT_DIR_NAME.match(name)
+    return match.group(1) if match else name
+
+
+def backfill(catalog, output_root=DEFAULT_OUTPUT_ROOT):
+    """Catalogues output directories written before the catalog existed."""
+    added = 0
+    for output_dir in sorted(p for p in Path(output_root).iterdir() if p.is_dir()):
+        feedback_path = output_dir / "feedback.json"
+        metrics_path = output_dir / "metrics.json"
+        feedback = json.loads(feedback_path.read_text()) if feedback_path.exists() else {}
+        metrics = json.loads(metrics_path.read_text()) if metrics_path.exists() else {}
+        if not feedback and not (output_dir / "annotated_video_streamlit.mp4").exists():
+            continue
+        summary = {
+            "output_dir": str(output_dir),
+            "stroke_type": feedback.get("stroke_type", "unknown"),
+            "confidence": feedback.get("confidence"),
+            "suggestions": feedback.get("suggestions", []),
+            "metrics": metrics,
+        }
+        video_name = metrics.get("video") or video_name_from_dir(output_dir.name)
+        added += catalog.record(summary, video_name, created=os.path.getmtime(output_dir))
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the analysis catalog.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fill = sub.add_parser("backfill", help="Add existing output directories to the catalog")
+    fill.add_argument("--output-root", default=str(DEFAULT_OUTPUT_ROOT))
+    fill.add_argument("--catalog", default=str(DEFAULT_CATALOG_PATH))
+    args = parser.parse_args()
+
+    catalog = Catalog(args.catalog)
+    added = backfill(catalog, args.output_root)
+    print(f"[✅] Catalogued {added} new analyses ({catalog.count()} total)")
@@ -0,0 +1,371 @@
+# src/detection.py
+
+import json
+
+import cv2
+import numpy as np
+
+# Columns of a per-frame detection array: x1, y1, x2, y2, conf, cls
+EMPTY_DETECTIONS = np.zeros((0, 6), dtype=np.float32)
+
+
+def result_to_array(result):
+    """Converts one ultralytics result into an (n, 6) float32 array."""
+    data = result.boxes.data
+    if hasattr(data, "cpu"):
+        data = data.cpu().numpy()
+    data = np.asarray(data, dtype=np.float32)
+    return data.reshape(-1, 6) if data.size else EMPTY_DETECTIONS
+
+
+def frame_targets(detections, names):
+    """Returns the (last) ball center and batsman box found in a detection array."""
+    ball_center, batsman_box = None, None
+    for x1, y1, x2, y2, conf, cls in detections.tolist():
+        label = names[int(cls)]
+        if label == "ball":
+            ball_center = (int((x1 + x2) / 2), int((y1 + y2) / 2))
+        if label == "batsman":
+            batsman_box = (int(x1), int(y1), int(x2), int(y2))
+    return ball_center, batsman_box
+
+
+def ball_in_box(center, box, margin=0.0):
+    """True if `center` lies inside `box` grown by `margin` x its size on every side."""
+    cx, cy = center
+    bx1, by1, bx2, by2 = box
+    mx, my = margin * (bx2 - bx1), margin * (by2 - by1)
+    return bx1 - mx < cx < bx2 + mx and by1 - my < cy < by2 + my
+
+
+def interpolate_detections(start, end, t):
+    """
+    Linearly interpolates boxes between two detection arrays at 0 <= t <= 1.
+    Boxes are paired per class by nearest center; unpaired boxes are dropped.
+    """
+    if not len(start) or not len(end):
+        return EMPTY_DETECTIONS
+    rows = []
+    for cls in np.intersect1d(start[:, 5], end[:, 5]):
+        a, b = start[start[:, 5] == cls], end[end[:, 5] == cls]
+        ca = (a[:, :2] + a[:, 2:4]) / 2
+        cb = (b[:, :2] + b[:, 2:4]) / 2
+        dist = np.linalg.norm(ca[:, None, :] - cb[None, :, :], axis=2)
+        used_a, used_b = set(), set()
+        for flat in np.argsort(dist, axis=None):
+            i, j = divmod(int(flat), len(b))
+            if i in used_a or j in used_b:
+                continue
+            used_a.add(i)
+            used_b.add(j)
+            row = (1 - t) * a[i] + t * b[j]
+            row[5] = cls
+            rows.append(row)
+    return np.array(rows, dtype=np.float32).reshape(-1, 6) if rows else EMPTY_DETECTIONS
+
+
+def read_batches(cap, batch_size):
+    """Yields lists of up to `batch_size` consecutive decoded frames."""
+    batch = []
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class FrameDetector:
+    """
+    Runs the YOLO model over lists of frames in fixed-size batches.
+    Returns one (n, 6) detection array per frame, in input order.
+    """
+
+    def __init__(self, model, batch_size=8, **predict_kwargs):
+        self.model = model
+        self.names = model.names
+        self.batch_size = max(1, int(batch_size))
+        self.predict_kwargs = predict_kwargs
+        self.calls = 0
+        self.frames = 0
+
+    def detect(self, frames, **overrides):
+        kwargs = {**self.predict_kwargs, **overrides}
+        detections = []
+        for start in range(0, len(frames), self.batch_size):
+            chunk = frames[start:start + self.batch_size]
+            results = self.model(chunk, **kwargs)
+            detections.extend(result_to_array(r) for r in results)
+            self.calls += 1
+            self.frames += len(chunk)
+        return detections
+
+    def detect_batch(self, first_idx, frames):
+        """Returns (detections, interpolated) for each frame of a consecutive batch."""
+        return [(d, False) for d in self.detect(frames)]
+
+
+class RoiDetector:
+    """
+    Detects on a padded crop around the last confident batsman box.
+
+    Until the batsman is locked, and whenever the track is lost or `refresh`
+    frames have gone by, the full frame is used instead. Crops are inferred
+    at a smaller image size and their boxes mapped back to frame coordinates.
+    """
+
+    def __init__(self, detector, pad=0.5, refresh=30, min_conf=0.5, max_imgsz=640):
+        self.detector = detector
+        self.names = detector.names
+        self.batch_size = detector.batch_size
+        self.pad = pad
+        self.refresh = max(1, int(refresh))
+        self.min_conf = min_conf
+        self.max_imgsz = max_imgsz
+        self.batsman_cls = next((c for c, n in self.names.items() if n == "batsman"), None)
+        self.box = None
+        self.since_full = 0
+        self.roi_frames = 0
+        self.full_frames = 0
+
+    def _crop_region(self, shape):
+        h, w = shape[:2]
+        x1, y1, x2, y2 = self.box
+        px, py = self.pad * (x2 - x1), self.pad * (y2 - y1)
+        return (max(0, int(x1 - px)), max(0, int(y1 - py)),
+                min(w, int(x2 + px)), min(h, int(y2 + py)))
+
+    def _update_track(self, detections):
+        """Keeps the most confident batsman box; returns False if none was found."""
+        if self.batsman_cls is None:
+            return False
+        batsmen = detections[(detections[:, 5] == self.batsman_cls) & (detections[:, 4] >= self.min_conf)]
+        if not len(batsmen):
+            return False
+        self.box = tuple(batsmen[np.argmax(batsmen[:, 4]), :4].tolist())
+        return True
+
+    def detect(self, frames):
+        detections = []
+        for start in range(0, len(frames), self.batch_size):
+            chunk = frames[start:start + self.batch_size]
+            if self.box is None or self.since_full >= self.refresh:
+                results = self.detector.detect(chunk)
+                self.full_frames += len(chunk)
+                self.since_full = 0
+                for d in results:
+                    self._update_track(d)
+            else:
+                rx1, ry1, rx2, ry2 = self._crop_region(chunk[0].shape)
+                imgsz = min(self.max_imgsz, -(-max(rx2 - rx1, ry2 - ry1) // 32) * 32)
+                results = self.detector.detect([f[ry1:ry2, rx1:rx2] for f in chunk], imgsz=imgsz)
+                results = [d + np.array([rx1, ry1, rx1, ry1, 0, 0], dtype=np.float32) for d in results]
+                self.roi_frames += len(chunk)
+                self.since_full += len(chunk)
+                # Lost track: forget the box so the next chunk goes full-frame
+                if not all([self._update_track(d) for d in results]):
+                    self.box = None
+            detections.extend(results)
+        return detections
+
+    def detect_batch(self, first_idx, frames):
+        return [(d, False) for d in self.detect(frames)]
+
+
+def _read_frame(video_path, frame_idx):
+    """One decoded frame by index, or None if the video cannot seek to it."""
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        ret, frame = cap.read()
+        return frame if ret else None
+    finally:
+        cap.release()
+
+
+class CoarseToFineDetector:
+    """
+    Two-pass detection for finding the contact frame with fewer detector calls.
+
+    `scan()` runs the detector on every `stride`-th frame (and the last one).
+    Around each sample where the ball is near the batsman box, up to the first
+    sample where it is inside, the frames in between are marked for dense
+    detection. `detect_batch()` then detects only those frames and fills the
+    rest from the coarse samples, interpolating the skipped ones.
+    """
+
+    def __init__(self, detector, stride=5, margin=0.5):
+        self.detector = detector
+        self.names = detector.names
+        self.batch_size = detector.batch_size
+        self.stride = max(1, int(stride))
+        self.margin = margin
+        self.coarse = {}
+        self.dense = set()
+        self.last_idx = -1
+
+    def scan(self, video_path):
+        cap = cv2.VideoCapture(str(video_path))
+        pending_idx, pending = [], []
+        frame_idx, last_frame = -1, None
+
+        def flush():
+            self.coarse.update(zip(pending_idx, self.detector.detect(pending)))
+            pending_idx.clear()
+            pending.clear()
+
+        # The last frame is always sampled; decoding near the container's frame count
+        # catches it without decoding the rest (an unknown count of 0 decodes every frame)
+        tail_from = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) - 1
+        last_frame_idx = -1
+        while cap.isOpened():
+            # grab() without retrieve() skips decoding frames the coarse pass does not detect
+            if not cap.grab():
+                break
+            frame_idx += 1
+            sampled = frame_idx % self.stride == 0
+            if not sampled and frame_idx < tail_from:
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                frame_idx -= 1
+                break
+            last_frame, last_frame_idx = frame, frame_idx
+            if sampled:
+                pending_idx.append(frame_idx)
+                pending.append(frame)
+                if len(pending) == self.batch_size:
+                    flush()
+        cap.release()
+
+        if frame_idx >= 0 and frame_idx % self.stride != 0:
+            if last_frame_idx != frame_idx:
+                # the container overstated its frame count; seek back for the real last frame
+                last_frame = _read_frame(video_path, frame_idx)
+            if last_frame is not None:
+                pending_idx.append(frame_idx)
+                pending.append(last_frame)
+        flush()
+
+        # interpolation needs a sample at last_idx; without the tail frame, stop at the last sample
+        self.last_idx = frame_idx if frame_idx in self.coarse or frame_idx < 0 else max(self.coarse)
+        self.dense = self._plan_dense()
+        return self
+
+    def _plan_dense(self):
+        samples = sorted(self.coarse)
+        dense = set()
+        for i, idx in enumerate(samples):
+            ball, batsman = frame_targets(self.coarse[idx], self.names)
+            if ball is None or batsman is None:
+                continue
+            inside = ball_in_box(ball, batsman)
+            if inside or ball_in_box(ball, batsman, self.margin):
+                lo = samples[i - 1] + 1 if i > 0 else 0
+                hi = idx if inside or i + 1 == len(samples) else samples[i + 1] - 1
+                dense.update(range(lo, hi + 1))
+            if inside:
+                break
+        return dense - set(samples)
+
+    def detect_batch(self, first_idx, frames):
+        indices = range(first_idx, first_idx + len(frames))
+        to_detect = [i for i in indices if i in self.dense]
+        detected = dict(zip(to_detect, self.detector.detect([frames[i - first_idx] for i in to_detect])))
+
+        batch = []
+        for i in indices:
+            if i in self.coarse:
+                batch.append((self.coarse[i], False))
+            elif i in detected:
+                batch.append((detected[i], False))
+            elif i > self.last_idx:
+                batch.append((EMPTY_DETECTIONS, True))
+            else:
+                prev = (i // self.stride) * self.stride
+                nxt = min(prev + self.stride, self.last_idx)
+                t = (i - prev) / (nxt - prev)
+                batch.append((interpolate_detections(self.coarse[prev], self.coarse[nxt], t), True))
+        return batch
+
+
+class DetectionTrack:
+    """
+    Per-frame detections of one video, stored column-wise.
+
+    The pipeline records every frame's detections into it and saves them as
+    an .npz (frame index, class, confidence and box columns, the per-frame
+    interpolated flag and the ball track). Loaded back, it serves the same
+    `detect_batch()` as the detectors, so the video can be re-annotated and
+    re-scored without running YOLO.
+    """
+
+    def __init__(self, names, batch_size=8, meta=None):
+        self.names = {int(k): v for k, v in names.items()}
+        self.batch_size = max(1, int(batch_size))
+        self.meta = dict(meta or {})
+        self._rows = []
+        self._interpolated = []
+        self.frame_idx = self.cls = self.conf = self.boxes = None
+
+    def record(self, frame_idx, detections, interpolated=False):
+        """Adds one frame; frames must be recorded in order, starting at 0."""
+        if frame_idx != len(self._interpolated):
+            raise ValueError(f"Expected frame {len(self._interpolated)}, got {frame_idx}")
+        self._rows.append(detections)
+        self._interpolated.append(bool(interpolated))
+
+    def _finish(self):
+        rows = self._rows
+        self.frame_idx = np.repeat(np.arange(len(rows), dtype=np.int32), [len(d) for d in rows])
+        stacked = np.concatenate(rows) if rows else EMPTY_DETECTIONS
+        self.boxes = stacked[:, :4].astype(np.float32)
+        self.conf = stacked[:, 4].astype(np.float32)
+        self.cls = stacked[:, 5].astype(np.int16)
+        self.interpolated = np.array(self._interpolated, dtype=bool)
+
+    def save(self, path, ball_centers=(), **meta):
+        self._finish()
+        self.meta.update(meta, names=self.names, frames=len(self.interpolated))
+        np.savez_compressed(
+            str(path),
+            frame_idx=self.frame_idx,
+            cls=self.cls,
+            conf=self.conf,
+            boxes=self.boxes,
+            interpolated=self.interpolated,
+            ball_track=np.asarray(ball_centers, dtype=np.int32).reshape(-1, 3),
+            meta=np.array(json.dumps(self.meta, default=str)),
+        )
+
+    @classmethod
+    def load(cls, path, batch_size=8):
+        with np.load(str(path)) as data:
+            meta = json.loads(str(data["meta"]))
+            track = cls(meta["names"], batch_size=batch_size, meta=meta)
+            track.frame_idx = data["frame_idx"]
+            track.cls = data["cls"]
+            track.conf = data["conf"]
+            track.boxes = data["boxes"]
+            track.interpolated = data["interpolated"]
+            track.ball_track = data["ball_track"]
+        return track
+
+    def frame_detections(self, frame_idx):
+        start, end = np.searchsorted(self.frame_idx, [frame_idx, frame_idx + 1])
+        if start == end:
+            return EMPTY_DETECTIONS
+        return np.column_stack([self.boxes[start:end], self.conf[start:end],
+                                self.cls[start:end].astype(np.float32)])
+
+    def detect_batch(self, first_idx, frames):
+        """Recorded (detections, interpolated) for each frame of a consecutive batch."""
+        results = []
+        for idx in range(first_idx, first_idx + len(frames)):
+            interpolated = bool(self.interpolated[idx]) if idx < len(self.interpolated) else False
+            results.append((self.frame_detections(idx), interpolated))
+        return results
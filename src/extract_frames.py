@@ -1,25 +1,241 @@
 # src/extract_frames.py
 import cv2
 import os
+import sys
+import time
+import shutil
+import zipfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_DIR))
+
+from src.fs_utils import file_sha256, load_manifest, save_manifest
 
 input_dir = "data/raw_videos"
 output_dir = "data/frames"
+MANIFEST_NAME = "manifest.json"
+
+
+def find_videos(root):
+    """Relative paths of all .mp4 files under `root`, including upload subfolders."""
+    videos = []
+    for dirpath, _, files in os.walk(root):
+        for file in files:
+            if file.endswith(".mp4"):
+                videos.append(os.path.relpath(os.path.join(dirpath, file), root))
+    return sorted(videos)
+
+
+def output_name(rel_path):
+    """data/raw_videos/clip.mp4 -> clip; data/raw_videos/<hash>/clip.mp4 -> <hash>_clip."""
+    return os.path.splitext(rel_path)[0].replace(os.sep, "_")
+
+
+# ========== PER-VIDEO EXTRACTION (one worker each) ==========
+def _motion_thumb(frame):
+    return cv2.cvtColor(cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+
+
+def extract_video(video_path, dest, params):
+    """
+    Writes the selected frames of one video to `dest` (a folder, or a .zip
+    with `params["archive"]`). Frames are picked every `step` frames; with a
+    motion threshold, a frame is also skipped when its downscaled grayscale
+    differs from the last written frame by less than the threshold (mean
+    absolute difference, 0-255). Returns counts for the manifest.
+    """
+    cv2.setNumThreads(1)
+    cap = cv2.VideoCapture(video_path)
+    src_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(1, int(params["stride"]))
+    if params["fps"]:
+        step = max(step, int(round(src_fps / params["fps"])))
+    encode_params = [cv2.IMWRITE_JPEG_QUALITY, int(params["jpeg_quality"])]
+
+    archive = zipfile.ZipFile(dest, "w", zipfile.ZIP_STORED) if params["archive"] else None
+    if archive is None:
+        os.makedirs(dest, exist_ok=True)
+
+    frame_idx = written = skipped_motion = 0
+    last_thumb = None
+    try:
+        while True:
+            # grab() without retrieve() skips decoding frames we don't keep
+            if not cap.grab():
+                break
+            if frame_idx % step:
+                frame_idx += 1
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            if params["motion_threshold"] > 0:
+                thumb = _motion_thumb(frame)
+                if last_thumb is not None and cv2.absdiff(thumb, last_thumb).mean() < params["motion_threshold"]:
+                    skipped_motion += 1
+                    frame_idx += 1
+                    continue
+                last_thumb = thumb
+
+            name = f"frame_{frame_idx:04d}.jpg"
+            if archive is None:
+                cv2.imwrite(os.path.join(dest, name), frame, encode_params)
+            else:
+                ok, buf = cv2.imencode(".jpg", frame, encode_params)
+                if ok:
+                    archive.writestr(name, buf.tobytes())
+            written += 1
+            frame_idx += 1
+    finally:
+        cap.release()
+        if archive is not None:
+            archive.close()
+    return {"frames": frame_idx, "written": written, "skipped_motion": skipped_motion, "step": step}
+
+
+# ========== INCREMENTAL RUN ==========
+def manifest_key(path):
+    """Manifest entries are keyed by the absolute source path, so several input dirs can share one output dir."""
+    return os.path.abspath(path)
+
+
+def migrate_manifest(input_root, manifest):
+    """Re-keys entries of older manifests (relative paths) that belong to `input_root`."""
+    for rel_path in [k for k in manifest if not os.path.isabs(k)]:
+        path = os.path.join(input_root, rel_path)
+        if os.path.exists(path):
+            manifest[manifest_key(path)] = dict(manifest.pop(rel_path), input_dir=os.path.abspath(input_root))
+
+
+def plan(videos, manifest, params, use_hash=False, force=False):
+    """Splits videos into (to_extract, unchanged) against the manifest."""
+    todo, unchanged = [], []
+    for rel_path, path in videos:
+        stat = os.stat(path)
+        entry = manifest.get(manifest_key(path))
+        if not force and entry and entry.get("params") == params:
+            if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                unchanged.append(rel_path)
+                continue
+            if use_hash and entry.get("sha256") and entry["sha256"] == file_sha256(path):
+                entry["mtime"] = stat.st_mtime
+                unchanged.append(rel_path)
+                continue
+        todo.append((rel_path, path))
+    return todo, unchanged
+
+
+def _remove_previous(dest):
+    if os.path.isdir(dest):
+        shutil.rmtree(dest)
+    elif os.path.exists(dest):
+        os.remove(dest)
+
+
+def remove_stale(input_root, manifest, prune=False):
+    """
+    Drops manifest entries of `input_root` whose source video no longer
+    exists. Entries of other input dirs are left alone. The extracted frames
+    stay on disk unless `prune` is set.
+    """
+    input_root = os.path.abspath(input_root)
+    stale = [key for key, entry in manifest.items()
+             if entry.get("input_dir") == input_root and not os.path.exists(key)]
+    for key in stale:
+        output = manifest.pop(key).get("output")
+        if prune and output:
+            _remove_previous(output)
+    return len(stale)
+
+
+def _extract_job(path, dest, params, use_hash):
+    stat = os.stat(path)
+    _remove_previous(dest)
+    # A changed video may switch between folder and archive output
+    _remove_previous(dest[:-4] if dest.endswith(".zip") else dest + ".zip")
+    result = extract_video(path, dest, params)
+    entry = {"size": stat.st_size, "mtime": stat.st_mtime, "output": dest, "params": params, **result}
+    if use_hash:
+        entry["sha256"] = file_sha256(path)
+    return entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract frames from raw videos for dataset building.")
+    parser.add_argument("--input-dir", default=input_dir)
+    parser.add_argument("--output-dir", default=output_dir)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Videos extracted in parallel, one per process (default: all cores)")
+    parser.add_argument("--stride", type=int, default=1, help="Keep every k-th frame (default: 1)")
+    parser.add_argument("--fps", type=float, default=0,
+                        help="Target frames per second; overrides a smaller --stride (default: 0, off)")
+    parser.add_argument("--motion-threshold", type=float, default=0,
+                        help="Skip frames whose mean grayscale change from the last kept frame is "
+                             "below this (0-255, default: 0, off)")
+    parser.add_argument("--jpeg-quality", type=int, default=95, help="JPEG quality 0-100 (default: 95)")
+    parser.add_argument("--archive", action="store_true",
+                        help="Write each video's frames into one <name>.zip instead of a folder of JPEGs")
+    parser.add_argument("--hash", action="store_true",
+                        help="Also compare content hashes, so touched but unchanged videos are skipped")
+    parser.add_argument("--force", action="store_true", help="Re-extract every video")
+    parser.add_argument("--prune", action="store_true",
+                        help="Also delete the extracted frames of videos that were removed from --input-dir "
+                             "(by default only their manifest entries are dropped)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = os.path.join(args.output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    params = {
+        "stride": args.stride,
+        "fps": args.fps,
+        "motion_threshold": args.motion_threshold,
+        "jpeg_quality": args.jpeg_quality,
+        "archive": args.archive,
+    }
+
+    input_root = os.path.abspath(args.input_dir)
+    migrate_manifest(input_root, manifest)
+    removed = remove_stale(input_root, manifest, prune=args.prune)
+    if removed:
+        kept = "and their frames" if args.prune else "frames kept; --prune deletes them"
+        print(f"[🧹] Dropped {removed} manifest entries whose videos are gone ({kept})")
+    videos = [(rel, os.path.join(args.input_dir, rel)) for rel in find_videos(args.input_dir)]
+    todo, unchanged = plan(videos, manifest, params, use_hash=args.hash, force=args.force)
+    print(f"[📁] {len(videos)} videos: {len(todo)} to extract, {len(unchanged)} up to date.")
+    if not todo:
+        save_manifest(manifest_path, manifest)
+        return
 
-os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    written = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {}
+        for rel_path, path in todo:
+            dest = os.path.join(args.output_dir, output_name(rel_path))
+            if args.archive:
+                dest += ".zip"
+            futures[pool.submit(_extract_job, path, dest, params, args.hash)] = (rel_path, path)
+        for future in as_completed(futures):
+            rel_path, path = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                print(f"[❌] {rel_path}: {e}")
+                continue
+            manifest[manifest_key(path)] = dict(entry, input_dir=input_root)
+            written += entry["written"]
+            # saved after every video so an interrupted run resumes where it stopped
+            save_manifest(manifest_path, manifest)
+            print(f"[✅] {rel_path}: {entry['written']}/{entry['frames']} frames "
+                  f"(step {entry['step']}, {entry['skipped_motion']} near-duplicates skipped)")
 
-for video_file in os.listdir(input_dir):
-    if not video_file.endswith(".mp4"): continue
-    vid_path = os.path.join(input_dir, video_file)
-    cap = cv2.VideoCapture(vid_path)
+    elapsed = time.perf_counter() - start
+    print(f"[📈] Wrote {written} frames from {len(todo)} videos in {elapsed:.1f}s")
 
-    name = os.path.splitext(video_file)[0]
-    folder_path = os.path.join(output_dir, name)
-    os.makedirs(folder_path, exist_ok=True)
 
-    frame_idx = 0
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret: break
-        cv2.imwrite(f"{folder_path}/frame_{frame_idx:04d}.jpg", frame)
-        frame_idx += 1
-    cap.release()
+if __name__ == "__main__":
+    main()
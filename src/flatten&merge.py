@@ -1,30 +1,126 @@
 import os
-import shutil
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT_DIR))
+
+from src.fs_utils import link_or_copy, file_sha256, load_manifest, save_manifest
 
 # Path to the base directory
-base_dir = r'C:\Users\naray\OneDrive\Desktop\Smart Stroke Analyzer\data\final_dataset'
-
-# Loop over all class folders (like back_foot_punch, cover_drive, etc.)
-for stroke_type in os.listdir(base_dir):
-    stroke_path = os.path.join(base_dir, stroke_type)
-
-    # If inside stroke_type we have subfolders like _01, _02, etc.
-    if os.path.isdir(stroke_path):
-        subfolders = [f for f in os.listdir(stroke_path) if os.path.isdir(os.path.join(stroke_path, f))]
-
-        if subfolders:
-            # Create a new flat folder if it doesn't exist
-            flat_dir = os.path.join(base_dir, f"{stroke_type}_flat")
-            os.makedirs(flat_dir, exist_ok=True)
-
-            for sub in subfolders:
-                subfolder_path = os.path.join(stroke_path, sub)
-                for file in os.listdir(subfolder_path):
-                    if file.endswith((".jpg", ".jpeg", ".png")):
-                        src = os.path.join(subfolder_path, file)
-                        # Rename with subfolder name prefix
-                        new_name = f"{sub}_{file}"
-                        dst = os.path.join(flat_dir, new_name)
-                        shutil.copy2(src, dst)
-
-            print(f"[✔] Merged into {flat_dir}")
+base_dir = ROOT_DIR / "data" / "final_dataset"
+MANIFEST_NAME = "merge_manifest.json"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def collect_sources(base, stroke_type):
+    """(relative source, source path, destination path) for every image in the stroke's subfolders."""
+    stroke_path = os.path.join(base, stroke_type)
+    flat_dir = os.path.join(base, f"{stroke_type}_flat")
+    sources = []
+    for sub in sorted(f for f in os.listdir(stroke_path) if os.path.isdir(os.path.join(stroke_path, f))):
+        subfolder_path = os.path.join(stroke_path, sub)
+        for file in sorted(os.listdir(subfolder_path)):
+            if file.endswith(IMAGE_EXTENSIONS):
+                # Rename with subfolder name prefix
+                sources.append((f"{stroke_type}/{sub}/{file}", os.path.join(subfolder_path, file),
+                                os.path.join(flat_dir, f"{sub}_{file}")))
+    return flat_dir, sources
+
+
+def merge_stroke(base, stroke_type, manifest, pool, place):
+    """
+    Flattens one stroke folder into `<stroke>_flat`. Byte-identical images
+    (same sha256) are kept once; unchanged sources (same size and mtime as
+    in the manifest) are neither re-hashed nor re-placed.
+    """
+    flat_dir, sources = collect_sources(base, stroke_type)
+    if not sources:
+        return None
+    os.makedirs(flat_dir, exist_ok=True)
+
+    stats = {}
+    for rel, src, _ in sources:
+        st = os.stat(src)
+        stats[rel] = (st.st_size, st.st_mtime)
+    changed = [(rel, src) for rel, src, _ in sources
+               if rel not in manifest or (manifest[rel]["size"], manifest[rel]["mtime"]) != stats[rel]]
+    hashes = dict(zip((rel for rel, _ in changed), pool.map(file_sha256, (src for _, src in changed))))
+    changed = {rel for rel, _ in changed}
+
+    counts = {"placed": 0, "unchanged": 0, "duplicates": 0}
+    seen = {}
+    to_place = []
+    for rel, src, dst in sources:
+        sha = hashes[rel] if rel in hashes else manifest[rel]["sha256"]
+        entry = {"size": stats[rel][0], "mtime": stats[rel][1], "sha256": sha}
+        if sha in seen:
+            entry["duplicate_of"] = seen[sha]
+            counts["duplicates"] += 1
+            if os.path.exists(dst):
+                os.remove(dst)
+        else:
+            seen[sha] = os.path.relpath(dst, base)
+            entry["dest"] = seen[sha]
+            previous = manifest.get(rel, {})
+            if rel in changed or previous.get("dest") != entry["dest"] or not os.path.exists(dst):
+                to_place.append((src, dst))
+            else:
+                counts["unchanged"] += 1
+        manifest[rel] = entry
+
+    for _ in pool.map(lambda pair: place(*pair), to_place):
+        counts["placed"] += 1
+    return flat_dir, counts
+
+
+def remove_stale(base, manifest):
+    """Drops manifest entries (and their merged files) whose sources no longer exist."""
+    removed = 0
+    for rel in [r for r in manifest if not os.path.exists(os.path.join(base, r))]:
+        dest = manifest.pop(rel).get("dest")
+        if dest and os.path.exists(os.path.join(base, dest)):
+            os.remove(os.path.join(base, dest))
+        removed += 1
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flatten stroke subfolders into <stroke>_flat folders.")
+    parser.add_argument("--base-dir", default=str(base_dir),
+                        help="Dataset root with one folder per stroke type (default: data/final_dataset)")
+    parser.add_argument("--workers", type=int, default=min(16, (os.cpu_count() or 1) * 2),
+                        help="Threads for hashing and copying")
+    parser.add_argument("--copy", action="store_true",
+                        help="Always copy instead of hard-linking (e.g. to edit merged images separately)")
+    args = parser.parse_args(argv)
+
+    base = args.base_dir
+    manifest_path = os.path.join(base, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    place = (lambda src, dst: link_or_copy(src, dst, link=False)) if args.copy else link_or_copy
+    start = time.perf_counter()
+
+    # Loop over all class folders (like back_foot_punch, cover_drive, etc.)
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        for stroke_type in sorted(os.listdir(base)):
+            if stroke_type.endswith("_flat") or not os.path.isdir(os.path.join(base, stroke_type)):
+                continue
+            merged = merge_stroke(base, stroke_type, manifest, pool, place)
+            if merged:
+                flat_dir, counts = merged
+                print(f"[✔] Merged into {flat_dir}: {counts['placed']} placed, "
+                      f"{counts['unchanged']} unchanged, {counts['duplicates']} duplicates dropped")
+
+    removed = remove_stale(base, manifest)
+    save_manifest(manifest_path, manifest)
+    if removed:
+        print(f"[🧹] Removed {removed} entries whose sources are gone")
+    print(f"[📈] Done in {time.perf_counter() - start:.1f}s; manifest at {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# src/frame_buffer.py
+
+from collections import deque
+
+import numpy as np
+
+
+class ContactFrameBuffer:
+    """
+    Bounded store for the raw frames the pipeline needs after the video loop.
+
+    Keeps a ring of the last `context` frames before the current one. When a
+    frame is promoted to contact, the ring is moved into `kept` and the next
+    `context` frames are kept as well, so the stroke window around contact
+    survives without holding the whole clip in memory. After that, frames
+    are no longer stored, so the peak is the 2 * context + 1 frame window.
+    """
+
+    def __init__(self, context=8):
+        self.context = max(0, int(context))
+        self._ring = deque(maxlen=self.context + 1)
+        self._spare = []
+        self._tail_left = 0
+        self.promoted = False
+        self.kept = {}
+        self.peak_bytes = 0
+
+    def push(self, frame_idx, frame):
+        """Stores a raw copy of `frame` before it gets drawn on."""
+        if self._tail_left > 0:
+            self.kept[frame_idx] = frame.copy()
+            self._tail_left -= 1
+        elif not self.promoted:
+            if len(self._ring) == self._ring.maxlen:
+                # Recycle the evicted slot instead of allocating a new frame
+                self._spare.append(self._ring.popleft()[1])
+            slot = self._spare.pop() if self._spare else None
+            if slot is None or slot.shape != frame.shape or slot.dtype != frame.dtype:
+                slot = frame.copy()
+            else:
+                np.copyto(slot, frame)
+            self._ring.append((frame_idx, slot))
+        self.peak_bytes = max(self.peak_bytes, self.nbytes)
+
+    def promote(self, frame_idx):
+        """Keeps `frame_idx`, the frames before it and the next `context` frames."""
+        for idx, frame in self._ring:
+            self.kept[idx] = frame
+        self._ring.clear()
+        self._spare.clear()
+        self._tail_left = self.context
+        self.promoted = True
+
+    def get(self, frame_idx):
+        if frame_idx in self.kept:
+            return self.kept[frame_idx]
+        for idx, frame in self._ring:
+            if idx == frame_idx:
+                return frame
+        return None
+
+    def window(self):
+        """Returns the kept (frame_idx, frame) pairs in frame order."""
+        return sorted(self.kept.items())
+
+    @property
+    def nbytes(self):
+        ring = sum(frame.nbytes for _, frame in self._ring)
+        spare = sum(frame.nbytes for frame in self._spare)
+        return ring + spare + sum(frame.nbytes for frame in self.kept.values())
@@ -0,0 +1,73 @@
+# src/fs_utils.py
+
+import hashlib
+import json
+import os
+import shutil
+
+
+def link_or_copy(src, dst, link=True):
+    """
+    Hard-links `src` to `dst`, falling back to a copy across filesystems or
+    where links are not supported. Replaces an existing `dst`. With
+    `link=False` it always copies.
+    """
+    src, dst = str(src), str(dst)
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if link:
+        try:
+            os.link(src, dst)
+            return "link"
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def inode_sizes(path):
+    """{(device, inode): size} of the files under `path`; hard links to one file appear once."""
+    sizes = {}
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            sizes[(st.st_dev, st.st_ino)] = st.st_size
+    return sizes
+
+
+def dir_size(path):
+    """Total size in bytes of the files under `path`, counting hard-linked files once."""
+    return sum(inode_sizes(path).values())
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(path):
+    """JSON manifest at `path`, or {} if there is none yet."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    """
+    Writes `manifest` as JSON to a temp file next to `path` and renames it
+    into place, so an interrupted run never leaves a partial manifest.
+    """
+    path = str(path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
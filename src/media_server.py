@@ -0,0 +1,144 @@
+# src/media_server.py
+
+import os
+import re
+import shutil
+import threading
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import quote
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+CHUNK_SIZE = 1024 * 1024
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def is_servable(rel_path):
+    """Only the videos inside job output dirs: <job dir>/<name>.mp4, no hidden files."""
+    parts = Path(rel_path).parts
+    return (len(parts) == 2 and parts[1].lower().endswith(".mp4")
+            and not any(part.startswith(".") for part in parts))
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Output videos with HTTP range support, so the browser seeks and streams
+    the annotated videos in pieces instead of the app loading whole MP4s.
+    Anything but a job's .mp4 files (catalog, cache db, manifests, images,
+    directory listings) is a 404.
+    """
+
+    def list_directory(self, path):
+        self.send_error(HTTPStatus.NOT_FOUND)
+        return None
+
+    def log_message(self, format, *args):
+        pass
+
+    def end_headers(self):
+        self.send_header("Accept-Ranges", "bytes")
+        super().end_headers()
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        rel_path = os.path.relpath(path, self.directory)
+        if rel_path.startswith(os.pardir) or not is_servable(rel_path) or not os.path.isfile(path):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return None
+
+        match = _RANGE.match(self.headers.get("Range", "").strip())
+        if match is None:
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        elif last:  # suffix range: the last N bytes
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            start, end = 0, size - 1
+        if start >= size or start > end:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return None
+
+        f = open(path, "rb")
+        f.seek(start)
+        self._remaining = end - start + 1
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(self._remaining))
+        self.end_headers()
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, "_remaining", None)
+        if remaining is None:
+            return shutil.copyfileobj(source, outputfile, CHUNK_SIZE)
+        self._remaining = None
+        while remaining > 0:
+            chunk = source.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+
+
+class MediaServer:
+    """
+    Serves the output videos under `root` over HTTP on a daemon thread.
+    `url_for(path)` maps a video to its URL, or returns None for anything
+    that is not served.
+
+    By default it listens on 127.0.0.1, which works when the browser runs on
+    the same machine as the app. To play videos from other machines, set
+    SMART_STROKE_MEDIA_HOST=0.0.0.0; URLs then use the host name the browser
+    reached the app on, unless SMART_STROKE_MEDIA_URL gives a public URL
+    (e.g. behind a reverse proxy). If the port (SMART_STROKE_MEDIA_PORT,
+    default 8765) is taken, a free one is used.
+    """
+
+    def __init__(self, root, host=None, port=None, base_url=None):
+        self.root = Path(root).resolve()
+        self.host = host or os.environ.get("SMART_STROKE_MEDIA_HOST", DEFAULT_HOST)
+        if port is None:
+            port = int(os.environ.get("SMART_STROKE_MEDIA_PORT", DEFAULT_PORT))
+        handler = partial(RangeRequestHandler, directory=str(self.root))
+        try:
+            self.httpd = ThreadingHTTPServer((self.host, port), handler)
+        except OSError:
+            self.httpd = ThreadingHTTPServer((self.host, 0), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.base_url = (base_url or os.environ.get("SMART_STROKE_MEDIA_URL") or "").rstrip("/") or None
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="media-server", daemon=True)
+        self._thread.start()
+
+    def url_for(self, path, request_host=None):
+        """
+        URL of a served video. `request_host` is the host name the browser
+        used for the app; it is only used when listening beyond loopback.
+        """
+        try:
+            rel = Path(path).resolve().relative_to(self.root)
+        except ValueError:
+            return None
+        if not is_servable(rel):
+            return None
+        if self.base_url:
+            base = self.base_url
+        elif request_host and self.host not in ("127.0.0.1", "localhost", "::1"):
+            base = f"http://{request_host}:{self.port}"
+        else:
+            base = f"http://{'127.0.0.1' if self.host == '127.0.0.1' else 'localhost'}:{self.port}"
+        return f"{base}/{quote(rel.as_posix())}"
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,172 @@
+# src/metrics.py
+
+import json
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def write_metrics(path, metrics):
+    with open(path, "w") as f:
+        json.dump(metrics, f, indent=4)
+
+
+class Metrics:
+    """
+    Named timing spans and counters for one analysis.
+
+    `with metrics.span("pose"):` adds the block's wall time to that span;
+    `metrics.count("frames_with_ball")` bumps a counter. Code that accepts a
+    `metrics` argument treats None as "not measured" via `or NULL_METRICS`.
+    """
+
+    def __init__(self):
+        self.spans = {}
+        self.counters = {}
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds, calls=1):
+        span = self.spans.setdefault(name, {"seconds": 0.0, "calls": 0})
+        span["seconds"] += seconds
+        span["calls"] += calls
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self):
+        return {
+            "spans": {name: {"seconds": round(s["seconds"], 4), "calls": s["calls"]}
+                      for name, s in self.spans.items()},
+            "counters": dict(self.counters),
+        }
+
+    def summary(self, names):
+        """One line with the seconds of the given top-level spans, for the console."""
+        return ", ".join(f"{name} {self.spans[name]['seconds']:.2f}s" for name in names if name in self.spans)
+
+
+class _NullMetrics(Metrics):
+    """Accepts spans and counters and keeps nothing."""
+
+    @contextmanager
+    def span(self, name):
+        yield
+
+    def add_time(self, name, seconds, calls=1):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+
+NULL_METRICS = _NullMetrics()
+
+
+def _prom_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def write_prometheus_textfile(path, metrics, labels=None, prefix="smart_stroke"):
+    """
+    Writes spans and counters in the Prometheus text format, for the node
+    exporter's textfile collector. Written to a temp file and renamed, so
+    the collector never reads a partial file.
+    """
+    labels = labels or {}
+
+    def fmt(extra):
+        pairs = {**labels, **extra}
+        escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                   for v in pairs.values())
+        return "{" + ",".join(f'{k}="{v}"' for k, v in zip(pairs, escaped)) + "}" if pairs else ""
+
+    lines = [
+        f"# HELP {prefix}_span_seconds Wall time spent in each pipeline span.",
+        f"# TYPE {prefix}_span_seconds gauge",
+    ]
+    for name, span in metrics.spans.items():
+        lines.append(f"{prefix}_span_seconds{fmt({'span': name})} {span['seconds']:.6f}")
+    lines += [
+        f"# HELP {prefix}_span_calls Number of times each pipeline span ran.",
+        f"# TYPE {prefix}_span_calls gauge",
+    ]
+    for name, span in metrics.spans.items():
+        lines.append(f"{prefix}_span_calls{fmt({'span': name})} {span['calls']}")
+    for name, value in metrics.counters.items():
+        metric = f"{prefix}_{_prom_name(name)}"
+        lines += [f"# TYPE {metric} gauge", f"{metric}{fmt({})} {value}"]
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+# ========== DEEP-DIVE PROFILING ==========
+@contextmanager
+def profiled(mode, output_dir):
+    """
+    Opt-in profiler around a block. "cprofile" writes profile.pstats (and
+    prints the top functions); "pyinstrument" writes profile.html if the
+    package is installed. None does nothing.
+    """
+    if not mode:
+        yield
+        return
+
+    if mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("[⚠️] pyinstrument is not installed; falling back to cProfile.")
+            mode = "cprofile"
+        else:
+            profiler = Profiler()
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                path = os.path.join(str(output_dir), "profile.html")
+                with open(path, "w") as f:
+                    f.write(profiler.output_html())
+                print(f"[📈] pyinstrument profile saved at {path}")
+            return
+
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = os.path.join(str(output_dir), "profile.pstats")
+        profiler.dump_stats(path)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+        print(f"[📈] cProfile stats saved at {path} (view with: python -m pstats {path})")
@@ -0,0 +1,159 @@
+# src/result_cache.py
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.fs_utils import dir_size, inode_sizes, file_sha256 as sha256_of
+
+CACHE_DB_NAME = "cache.sqlite"
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+# Outputs used this recently are never evicted: another worker may be linking from or returning them
+EVICT_GRACE_SECONDS = 600
+
+# (path, size, mtime_ns) -> sha256, so model weights are hashed once per process
+_file_hashes = {}
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    path = str(path)
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_hashes:
+        _file_hashes[memo_key] = sha256_of(path, chunk_size)
+    return _file_hashes[memo_key]
+
+
+def fingerprint(paths):
+    """One hash over several files (name + content); missing files count as absent."""
+    digest = hashlib.sha256()
+    for path in sorted(str(p) for p in paths):
+        digest.update(os.path.basename(path).encode())
+        digest.update(file_sha256(path).encode() if os.path.exists(path) else b"missing")
+    return digest.hexdigest()
+
+
+def cache_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed index of analysis output directories.
+
+    Entries map a key (video hash + model hashes + options) to an output
+    directory and a JSON payload, in a SQLite file next to the outputs.
+    Several entries can share a directory, e.g. the detection pass and the
+    full result of the same run. `evict()` deletes whole directories, least
+    recently used first, until the cached outputs fit in `max_bytes`.
+    """
+
+    def __init__(self, output_root, max_bytes=DEFAULT_MAX_BYTES):
+        self.output_root = Path(output_root)
+        self.output_root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.db_path = self.output_root / CACHE_DB_NAME
+        with self._connect() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    output_dir TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )""")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_dir ON entries (output_dir)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, key):
+        """Returns (output_dir, data) and marks it used, or None."""
+        with self._connect() as db:
+            row = db.execute("SELECT output_dir, data FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            output_dir = Path(row[0])
+            if not output_dir.is_dir():
+                db.execute("DELETE FROM entries WHERE output_dir = ?", (row[0],))
+                return None
+            now = time.time()
+            db.execute("UPDATE entries SET last_access = ? WHERE output_dir = ?", (now, row[0]))
+        # Keeps "latest output" views (sorted by mtime) pointing at the reused run
+        os.utime(output_dir)
+        return output_dir, json.loads(row[1])
+
+    def put(self, key, kind, output_dir, data):
+        output_dir = str(Path(output_dir).resolve())
+        now = time.time()
+        size = dir_size(output_dir)
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, output_dir, json.dumps(data, default=str), size, now, now),
+            )
+            db.execute("UPDATE entries SET bytes = ?, last_access = ? WHERE output_dir = ?", (size, now, output_dir))
+
+    def _dirs_by_lru(self):
+        """(output_dir, last_access) pairs, least recently used first."""
+        with self._connect() as db:
+            return db.execute(
+                "SELECT output_dir, MAX(last_access) FROM entries GROUP BY output_dir ORDER BY MAX(last_access)"
+            ).fetchall()
+
+    def total_bytes(self):
+        """Disk usage of the cached outputs; files hard-linked between them count once."""
+        inodes = {}
+        for output_dir, _ in self._dirs_by_lru():
+            inodes.update(inode_sizes(output_dir))
+        return sum(inodes.values())
+
+    def evict(self, keep=()):
+        """
+        Deletes least recently used output directories until under max_bytes.
+        Partial hits hard-link artifacts between outputs, so usage is counted
+        per inode: deleting a directory only frees files no other output links.
+        Outputs in `keep` or used within EVICT_GRACE_SECONDS are skipped.
+        """
+        keep = {str(Path(p).resolve()) for p in keep}
+        recent = time.time() - EVICT_GRACE_SECONDS
+        lru = self._dirs_by_lru()
+        keep.update(output_dir for output_dir, last_access in lru if last_access >= recent)
+        dirs = {output_dir: inode_sizes(output_dir) for output_dir, _ in lru}
+        refs = Counter(inode for inodes in dirs.values() for inode in inodes)
+        sizes = {}
+        for inodes in dirs.values():
+            sizes.update(inodes)
+        total = sum(sizes.values())
+        evicted = []
+        for output_dir, inodes in dirs.items():
+            if total <= self.max_bytes:
+                break
+            if output_dir in keep:
+                continue
+            shutil.rmtree(output_dir, ignore_errors=True)
+            with self._connect() as db:
+                db.execute("DELETE FROM entries WHERE output_dir = ?", (output_dir,))
+            for inode, size in inodes.items():
+                refs[inode] -= 1
+                if refs[inode] == 0:
+                    total -= size
+            evicted.append(output_dir)
+        if evicted:
+            print(f"[🧹] Evicted {len(evicted)} cached output(s); cache now {total / (1024 * 1024):.1f} MB")
+        return evicted
@@ -0,0 +1,86 @@
+# src/stages.py
+
+import queue
+import threading
+
+# Marks the end of a stage's output
+END = object()
+
+
+class StageAborted(Exception):
+    """Raised in a stage when another stage failed and the pipeline is stopping."""
+
+
+class StageStats:
+    """Frames handled and busy time of one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.busy = 0.0
+
+    def add(self, frames, seconds):
+        self.frames += frames
+        self.busy += seconds
+
+    def as_dict(self):
+        return {
+            "frames": self.frames,
+            "busy_s": round(self.busy, 4),
+            "fps": self.frames / self.busy if self.busy > 0 else None,
+        }
+
+
+class BoundedQueue:
+    """
+    queue.Queue with a size bound that gives up when `stop` is set, so a
+    stage blocked on a full or empty queue notices that another one failed.
+    """
+
+    def __init__(self, maxsize, stop):
+        self._queue = queue.Queue(maxsize=max(1, maxsize))
+        self._stop = stop
+
+    def put(self, item):
+        while True:
+            if self._stop.is_set():
+                raise StageAborted()
+            try:
+                self._queue.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                pass
+
+    def get(self):
+        while True:
+            if self._stop.is_set():
+                raise StageAborted()
+            try:
+                return self._queue.get(timeout=0.2)
+            except queue.Empty:
+                pass
+
+
+class StageThread(threading.Thread):
+    """Runs one stage; on failure keeps the exception and sets `stop`."""
+
+    def __init__(self, name, target, stop):
+        super().__init__(name=name, daemon=True)
+        self._target_fn = target
+        self._stop_event = stop
+        self.error = None
+
+    def run(self):
+        try:
+            self._target_fn()
+        except StageAborted:
+            pass
+        except BaseException as e:
+            self.error = e
+            self._stop_event.set()
+
+
+def bottleneck(stats):
+    """Name of the stage with the most busy time."""
+    busiest = max(stats.values(), key=lambda s: s.busy, default=None)
+    return busiest.name if busiest else None
@@ -0,0 +1,69 @@
+# src/trajectory.py
+
+import cv2
+import numpy as np
+
+
+class TrajectoryOverlay:
+    """
+    Persistent ball-trajectory layer composited onto each frame.
+
+    Every new ball center draws a single segment onto the layer, and
+    `composite()` blends the layer's occupied region onto a frame in one
+    vectorized step, so the per-frame cost does not grow with the track.
+
+    `opacity` scales the whole trail; `fade` (0..1) is the fraction of a
+    segment's strength lost per frame, giving a fading tail.
+    """
+
+    def __init__(self, shape, color=(0, 255, 255), thickness=2, opacity=1.0, fade=0.0):
+        h, w = shape[:2]
+        self.color = color
+        self.thickness = thickness
+        self.opacity = opacity
+        self.decay = int(round(256 * (1 - fade))) if fade > 0 else None
+        self.layer = np.zeros((h, w, 3), dtype=np.uint8)
+        self.alpha = np.zeros((h, w), dtype=np.uint8)
+        self.last = None
+        self.bbox = None
+
+    def add_point(self, x, y):
+        point = (int(x), int(y))
+        if self.last is not None:
+            cv2.line(self.layer, self.last, point, self.color, self.thickness)
+            cv2.line(self.alpha, self.last, point, 255, self.thickness)
+            self._grow_bbox(self.last, point)
+        self.last = point
+
+    def _grow_bbox(self, p1, p2):
+        h, w = self.alpha.shape
+        r = self.thickness
+        x1, x2 = max(0, min(p1[0], p2[0]) - r), min(w, max(p1[0], p2[0]) + r + 1)
+        y1, y2 = max(0, min(p1[1], p2[1]) - r), min(h, max(p1[1], p2[1]) + r + 1)
+        if self.bbox is not None:
+            bx1, by1, bx2, by2 = self.bbox
+            x1, y1, x2, y2 = min(x1, bx1), min(y1, by1), max(x2, bx2), max(y2, by2)
+        if x1 < x2 and y1 < y2:
+            self.bbox = (x1, y1, x2, y2)
+
+    def composite(self, frame):
+        """Draws the trail onto `frame` in place and returns it."""
+        if self.bbox is None:
+            return frame
+        x1, y1, x2, y2 = self.bbox
+        roi = frame[y1:y2, x1:x2]
+        layer = self.layer[y1:y2, x1:x2]
+        alpha = self.alpha[y1:y2, x1:x2]
+
+        if self.decay is None and self.opacity >= 1.0:
+            np.copyto(roi, layer, where=(alpha > 0)[..., None])
+        else:
+            a = alpha.astype(np.uint16)
+            if self.opacity < 1.0:
+                a = (a * int(round(256 * self.opacity))) >> 8
+            a = a[..., None]
+            roi[:] = ((roi * (255 - a) + layer * a) // 255).astype(np.uint8)
+
+        if self.decay is not None:
+            alpha[:] = (alpha.astype(np.uint16) * self.decay) >> 8
+        return frame
@@ -6,140 +6,636 @@ import cv2
 import numpy as np
 from ultralytics import YOLO
 from pathlib import Path
-import subprocess
 from datetime import datetime
 import json
+import argparse
+import threading
+import time
+import uuid
 
 ROOT_DIR = Path(__file__).resolve().parent.parent
 sys.path.append(str(ROOT_DIR))
 sys.path.append(str(ROOT_DIR / "feedback_app"))
 
-from pose_estimation.utils import run_pose_estimation_from_array
-from feedback_app.utils import predict_stroke_type, load_classifier_model
-from pose_estimation.ai_feedback import get_ai_suggestions
+from pose_estimation.utils import run_pose_estimation_from_array, PoseEngine
+from pose_estimation.dtw import load_reference_sequences, compare_stroke
+from pose_estimation.reference_library import get_reference_library, REFERENCE_DIR
+from feedback_app.utils import StrokeClassifier, CLASSIFIER_MODEL_PATH, CLASS_MAPPING_PATH
+from feedback_app.classifier_backends import BACKENDS, EXPORT_DIR, EXPORT_FILES, load_backend
+from pose_estimation.pose_compare import RULES_PATH
+from pose_estimation.ai_feedback import get_ai_suggestions, KEYPOINTS
+from src.frame_buffer import ContactFrameBuffer
+from src.trajectory import TrajectoryOverlay
+from src.detection import FrameDetector, RoiDetector, CoarseToFineDetector, DetectionTrack, read_batches
+from src.annotate import FrameAnnotator
+from src.stages import END, BoundedQueue, StageAborted, StageStats, StageThread, bottleneck
+from src.video_writer import open_video_writer, PREVIEW_NAME
+from src.result_cache import ResultCache, DEFAULT_MAX_BYTES, cache_key, file_sha256, fingerprint
+from src.fs_utils import link_or_copy
+from src.catalog import Catalog
+from src.metrics import Metrics, NULL_METRICS, peak_rss_mb, profiled, write_metrics, write_prometheus_textfile
+
+DEFAULT_OUTPUT_ROOT = ROOT_DIR / "data" / "outputs"
+YOLO_MODEL_PATH = ROOT_DIR / "models" / "yolov8_ball.pt"
+TRACK_NAME = "detections.npz"
+
+
+# === CLI / options ===
+def build_parser():
+    parser = argparse.ArgumentParser(description="Detect contact, pose and stroke type in a batting video.")
+    parser.add_argument("input_video", nargs="?", help="Path to the input video")
+    parser.add_argument("--context-frames", type=int, default=15,
+                        help="Raw frames kept before and after the contact frame; this is the "
+                             "stroke window used for the pose time series (default: 15)")
+    parser.add_argument("--batch-size", type=int, default=8,
+                        help="Frames sent to the detector per inference call (default: 8)")
+    parser.add_argument("--stride", type=int, default=1,
+                        help="Coarse-to-fine search: detect every k-th frame first, then densely "
+                             "around the approach to the batsman (default: 1, dense)")
+    parser.add_argument("--coarse-margin", type=float, default=0.5,
+                        help="How far outside the batsman box (fraction of its size) the ball "
+                             "triggers a dense search window (default: 0.5)")
+    parser.add_argument("--roi", action="store_true",
+                        help="After the batsman is locked, detect on a padded crop around it")
+    parser.add_argument("--roi-pad", type=float, default=0.5,
+                        help="Crop padding around the batsman box, as a fraction of its size (default: 0.5)")
+    parser.add_argument("--roi-refresh", type=int, default=30,
+                        help="Run a full-frame pass at least every N detected frames (default: 30)")
+    parser.add_argument("--roi-min-conf", type=float, default=0.5,
+                        help="Batsman confidence needed to lock or keep the crop (default: 0.5)")
+    parser.add_argument("--queue-depth", type=int, default=4,
+                        help="Batches buffered between the decode, detect and annotate/write "
+                             "threads; bounds frames in flight (default: 4)")
+    parser.add_argument("--video-preset", default="veryfast",
+                        help="libx264 preset for the annotated video (default: veryfast)")
+    parser.add_argument("--video-crf", type=int, default=23,
+                        help="libx264 CRF; lower is higher quality and larger (default: 23)")
+    parser.add_argument("--preview-height", type=int, default=0,
+                        help=f"Also write {PREVIEW_NAME} scaled to this height in the same "
+                             "encode (default: 0, no preview)")
+    parser.add_argument("--trail-opacity", type=float, default=1.0,
+                        help="Opacity of the ball trajectory overlay (default: 1.0)")
+    parser.add_argument("--trail-fade", type=float, default=0.0,
+                        help="Fraction of trajectory strength lost per frame, for a fading tail (default: 0)")
+    parser.add_argument("--classify-frames", type=int, default=0,
+                        help="Also classify N buffered frames on each side of contact and "
+                             "average the logits (default: 0, contact frame only)")
+    parser.add_argument("--classifier-backend", default="eager", choices=BACKENDS,
+                        help="Stroke classifier inference backend (default: eager); exported "
+                             "backends come from feedback_app/classifier_backends.py export")
+    parser.add_argument("--top-k", type=int, default=3,
+                        help="Number of ranked stroke labels saved in feedback.json (default: 3)")
+    parser.add_argument("--replay", metavar="DETECTIONS",
+                        help="Skip YOLO and reuse the detections.npz of an earlier run (file or output "
+                             "directory) to regenerate the video, contact frame, pose and feedback; "
+                             "input_video defaults to the video the track was recorded from")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="Always run the full analysis, without reading or writing the result cache")
+    parser.add_argument("--cache-max-gb", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 3,
+                        help="Size bound of cached outputs; least recently used ones are deleted "
+                             "beyond it (default: 5)")
+    parser.add_argument("--prometheus-textfile", metavar="PATH",
+                        help="Also write the run's spans and counters in the Prometheus text format, "
+                             "e.g. into the node exporter's textfile collector directory")
+    parser.add_argument("--profile", choices=("cprofile", "pyinstrument"),
+                        help="Profile the analysis into the output directory (profile.pstats or "
+                             "profile.html); cache hits skip the analysis, so combine with --no-cache")
+    return parser
+
+
+def default_options(**overrides):
+    """Pipeline options with CLI defaults, for callers that import analyze_video()."""
+    options = build_parser().parse_args([])
+    for key, value in overrides.items():
+        setattr(options, key, value)
+    return options
+
+
+# === Models ===
+def load_models(classifier_backend="eager", detector=True):
+    """
+    Loads the detector and classifier once; pass the result to analyze_video().
+    Replays only need the classifier, so `detector=False` skips YOLO.
+    """
+    return {
+        "yolo": YOLO(str(YOLO_MODEL_PATH)) if detector else None,
+        "classifier": StrokeClassifier(load_backend(classifier_backend)),
+    }
+
+
+def new_output_dir(input_video, output_root=DEFAULT_OUTPUT_ROOT):
+    """
+    <stem>_<timestamp>_<random suffix>; the suffix keeps same-named clips
+    started in the same second by different workers apart.
+    """
+    video_name = os.path.splitext(os.path.basename(str(input_video)))[0]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_dir = Path(output_root) / f"{video_name}_{timestamp}_{uuid.uuid4().hex[:8]}"
+    Path(output_root).mkdir(parents=True, exist_ok=True)
+    output_dir.mkdir(exist_ok=False)
+    return output_dir
+
+
+def _no_progress(fraction, message):
+    pass
+
+
+def replay_track_path(replay):
+    """--replay takes a detections.npz or the output directory holding one."""
+    path = Path(replay)
+    return path / TRACK_NAME if path.is_dir() else path
+
+
+def build_frame_source(input_video, options, models, progress=_no_progress):
+    """
+    Composes the per-frame detection provider from the options.
+    Returns (detector, frame_source, roi_detector or None).
+    """
+    if options.replay:
+        track = DetectionTrack.load(replay_track_path(options.replay), options.batch_size)
+        print(f"[♻️] Replaying detections from: {replay_track_path(options.replay)}")
+        return track, track, None
+
+    detector = frame_source = FrameDetector(models["yolo"], batch_size=options.batch_size, verbose=False)
+    roi_detector = None
+    if options.roi:
+        frame_source = roi_detector = RoiDetector(detector, pad=options.roi_pad, refresh=options.roi_refresh,
+                                                  min_conf=options.roi_min_conf)
+    if options.stride > 1:
+        progress(0.0, "Coarse contact search")
+        frame_source = CoarseToFineDetector(frame_source, stride=options.stride,
+                                            margin=options.coarse_margin).scan(input_video)
+        print(f"[🔎] Coarse pass: {len(frame_source.coarse)} samples, "
+              f"{len(frame_source.dense)} frames in the dense contact window")
+    return detector, frame_source, roi_detector
+
+
+# === Detection pass ===
+def scan_video(input_video, output_dir, options, models, progress=_no_progress, metrics=None):
+    """
+    Decodes the video once: detects, annotates and writes every frame, and
+    finds the contact frame. Returns the contact info, the buffered stroke
+    window and run stats. Stage times and frame counters go to `metrics`.
+
+    With `options.replay`, detections come from a saved detections.npz
+    instead of YOLO; the video is only decoded, re-annotated and re-scored.
+    """
+    metrics = metrics or NULL_METRICS
+    with metrics.span("scan.setup"):
+        detector, frame_source, roi_detector = build_frame_source(input_video, options, models, progress)
+
+    # === Video IO ===
+    cap = cv2.VideoCapture(str(input_video))
+    width, height = int(cap.get(3)), int(cap.get(4))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+    preview_path = output_dir / PREVIEW_NAME if options.preview_height else None
+    out, encoder = open_video_writer(output_dir / "annotated_video_streamlit.mp4", fps, (width, height),
+                                     preset=options.video_preset, crf=options.video_crf,
+                                     preview_path=preview_path, preview_height=options.preview_height)
+
+    frame_buffer = ContactFrameBuffer(context=options.context_frames)
+    trajectory = TrajectoryOverlay((height, width), opacity=options.trail_opacity, fade=options.trail_fade)
+    annotator = FrameAnnotator(detector.names, out, frame_buffer, trajectory)
+    track = DetectionTrack(detector.names, meta={"video": str(input_video), "fps": fps,
+                                                 "width": width, "height": height})
+
+    # === Stages: decode -> detect -> annotate + write
+    # Each queue holds at most `queue_depth` batches, which bounds the frames
+    # in flight; one thread per stage and FIFO queues keep frame order.
+    stop = threading.Event()
+    decoded = BoundedQueue(options.queue_depth, stop)
+    detected = BoundedQueue(options.queue_depth, stop)
+    stage_stats = {name: StageStats(name) for name in ("decode", "detect", "annotate_write")}
+    frames_written = [0]
+
+    def decode_stage():
+        first_idx = 0
+        batches = read_batches(cap, detector.batch_size)
+        while True:
+            start = time.perf_counter()
+            frames = next(batches, None)
+            if frames is None:
+                break
+            stage_stats["decode"].add(len(frames), time.perf_counter() - start)
+            decoded.put((first_idx, frames))
+            first_idx += len(frames)
+        decoded.put(END)
+
+    def annotate_stage():
+        while True:
+            item = detected.get()
+            if item is END:
+                break
+            first_idx, frames, results = item
+            start = time.perf_counter()
+            for offset, (frame, (detections, interpolated)) in enumerate(zip(frames, results)):
+                track.record(first_idx + offset, detections, interpolated)
+                annotator.process(first_idx + offset, frame, detections, interpolated)
+            stage_stats["annotate_write"].add(len(frames), time.perf_counter() - start)
+            frames_written[0] = first_idx + len(frames)
+            if total_frames:
+                progress(min(frames_written[0] / total_frames, 1.0) * 0.8,
+                         f"Detecting: frame {frames_written[0]}/{total_frames}")
+
+    threads = [StageThread("decode", decode_stage, stop), StageThread("annotate_write", annotate_stage, stop)]
+    for thread in threads:
+        thread.start()
+    try:
+        while True:
+            item = decoded.get()
+            if item is END:
+                break
+            first_idx, frames = item
+            start = time.perf_counter()
+            results = frame_source.detect_batch(first_idx, frames)
+            stage_stats["detect"].add(len(frames), time.perf_counter() - start)
+            detected.put((first_idx, frames, results))
+        detected.put(END)
+    except StageAborted:
+        pass
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+        cap.release()
+        release_start = time.perf_counter()
+        out.release()
+        release_seconds = time.perf_counter() - release_start
+    for thread in threads:
+        if thread.error is not None:
+            raise thread.error
+
+    frame_idx = frames_written[0]
+    contact_frame_idx = annotator.contact_frame_idx
+    batsman_box_at_contact = annotator.batsman_box_at_contact
+    ball_centers = annotator.ball_centers
+    track.save(output_dir / TRACK_NAME, ball_centers=ball_centers, contact_frame_idx=contact_frame_idx)
+    slowest = bottleneck(stage_stats)
+    print("[📈] Stage throughput: " + ", ".join(
+        f"{name} {s.frames / s.busy:.1f} fps" if s.busy > 0 else f"{name} -"
+        for name, s in stage_stats.items()) + f" (bottleneck: {slowest})")
+
+    stats = {
+        "frames": frame_idx,
+        "fps": fps,
+        "detector_calls": getattr(detector, "calls", 0),
+        "detector_frames": getattr(detector, "frames", 0),
+        "replay": bool(options.replay),
+        "stride": options.stride,
+        "batch_size": detector.batch_size,
+        "frame_buffer_peak_mb": frame_buffer.peak_bytes / (1024 * 1024),
+        "queue_depth": options.queue_depth,
+        "encoder": encoder,
+        # writer time inside annotate_write, plus flushing the encoder at the end
+        "encode_s": annotator.write_seconds + release_seconds,
+        "video_mb": os.path.getsize(output_dir / "annotated_video_streamlit.mp4") / (1024 * 1024),
+        "stages": {name: s.as_dict() for name, s in stage_stats.items()},
+        "bottleneck": slowest,
+    }
+    if roi_detector is not None:
+        stats["roi_frames"] = roi_detector.roi_frames
+        stats["full_frames"] = roi_detector.full_frames
+
+    # Stages overlap, so these are busy times per thread, not slices of the wall time
+    for name, s in stage_stats.items():
+        metrics.add_time(f"scan.{name}", s.busy)
+    metrics.add_time("scan.encode", stats["encode_s"])
+    metrics.count("frames", frame_idx)
+    metrics.count("detector_calls", stats["detector_calls"])
+    metrics.count("detector_frames", stats["detector_frames"])
+    metrics.count("frames_with_ball", annotator.frames_with_ball)
+    metrics.count("frames_with_batsman", annotator.frames_with_batsman)
+
+    return {
+        "contact_frame_idx": contact_frame_idx,
+        "batsman_box": batsman_box_at_contact,
+        "frame_buffer": frame_buffer,
+        "ball_centers": ball_centers,
+        "stats": stats,
+    }
 
-# === CLI ===
-if len(sys.argv) > 1:
-    INPUT_VIDEO = sys.argv[1]
-    if not os.path.exists(INPUT_VIDEO):
-        print(f"[❌] Input video not found: {INPUT_VIDEO}")
-        sys.exit(1)
-else:
-    print("[❌] Please provide input video path.")
-    sys.exit(1)
-
-# === Auto Setup ===
-VIDEO_NAME = os.path.splitext(os.path.basename(INPUT_VIDEO))[0]
-TIMESTAMP = datetime.now().strftime("%Y%m%d_%H%M%S")
-OUTPUT_DIR = ROOT_DIR / f"data/outputs/{VIDEO_NAME}_{TIMESTAMP}"
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
-model = YOLO(str(ROOT_DIR / "models/yolov8_ball.pt"))
-classifier_model = load_classifier_model()
-
-# === Video IO ===
-cap = cv2.VideoCapture(INPUT_VIDEO)
-width, height = int(cap.get(3)), int(cap.get(4))
-fps = cap.get(cv2.CAP_PROP_FPS)
-out = cv2.VideoWriter(str(OUTPUT_DIR / "annotated_video.mp4"), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
-
-ball_centers = []
-contact_frame_idx = -1
-frame_idx = 0
-all_frames = []
-batsman_box_at_contact = None
-
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    all_frames.append(frame.copy())
-    results = model(frame)[0]
-    ball_detected = False
-    batsman_box = None
-
-    for box in results.boxes.data.tolist():
-        x1, y1, x2, y2, conf, cls = box
-        cls = int(cls)
-        label = model.names[cls]
-        color = (0, 255, 0) if label == 'ball' else (255, 0, 0)
-        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-        cv2.putText(frame, label, (int(x1), int(y1) - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-        if label == "ball":
-            cx, cy = int((x1 + x2) / 2), int((y1 + y2) / 2)
-            ball_centers.append((frame_idx, cx, cy))
-            ball_detected = True
-        if label == "batsman":
-            batsman_box = (int(x1), int(y1), int(x2), int(y2))
-
-    if contact_frame_idx == -1 and ball_detected and batsman_box:
-        bx1, by1, bx2, by2 = batsman_box
-        cx, cy = ball_centers[-1][1], ball_centers[-1][2]
-        if bx1 < cx < bx2 and by1 < cy < by2:
-            contact_frame_idx = frame_idx
-            batsman_box_at_contact = batsman_box
-            cv2.putText(frame, "🎯 Contact Point", (30, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 3)
-
-    for i in range(1, len(ball_centers)):
-        _, x1, y1 = ball_centers[i - 1]
-        _, x2, y2 = ball_centers[i]
-        cv2.line(frame, (x1, y1), (x2, y2), (0, 255, 255), 2)
-
-    out.write(frame)
-    frame_idx += 1
-
-cap.release()
-out.release()
 
 # === Contact frame processing ===
-stroke_type = "unknown"
-suggestions = []
+def estimate_pose(scan, output_dir, classifier, metrics=None):
+    """
+    Pose over the stroke window and at contact, plus the resized classifier
+    inputs for the window. Everything is written to `output_dir`, where
+    load_pose() picks it up again when a cached detection pass is reused.
+    """
+    metrics = metrics or NULL_METRICS
+    contact_frame_idx = scan["contact_frame_idx"]
+    frame_buffer = scan["frame_buffer"]
 
-if contact_frame_idx != -1 and batsman_box_at_contact:
-    contact_img_path = OUTPUT_DIR / "contact_frame.jpg"
-    contact_frame = all_frames[contact_frame_idx]
+    contact_img_path = output_dir / "contact_frame.jpg"
+    contact_frame = frame_buffer.get(contact_frame_idx)
     cv2.imwrite(str(contact_img_path), contact_frame)
 
-    bx1, by1, bx2, by2 = batsman_box_at_contact
+    bx1, by1, bx2, by2 = scan["batsman_box"]
     cropped_batsman = contact_frame[by1:by2, bx1:bx2]
 
+    # pose time series over the stroke window (backlift -> contact -> follow-through)
+    window = frame_buffer.window()
+    with PoseEngine(static_image_mode=False, metrics=metrics) as pose_tracker:
+        stroke_pose = pose_tracker.process_batch([f[by1:by2, bx1:bx2] for _, f in window])
+    np.save(str(output_dir / "stroke_pose.npy"), stroke_pose)
+
     # run pose estimation on cropped
-    annotated_cropped, pose_arr = run_pose_estimation_from_array(cropped_batsman)
+    with metrics.span("pose.contact"):
+        annotated_cropped, pose_arr = run_pose_estimation_from_array(cropped_batsman)
+
+    # paste pose overlay back on a copy of the original
+    contact_pose_frame = contact_frame.copy()
+    contact_pose_frame[by1:by2, bx1:bx2] = annotated_cropped
+    cv2.imwrite(str(output_dir / "contact_frame_pose.jpg"), contact_pose_frame)
+    np.save(str(output_dir / "contact_pose.npy"), pose_arr)
+
+    # 224x224 classifier inputs instead of full frames, so a classifier change
+    # does not need the video again
+    window_idx = np.array([idx for idx, _ in window])
+    with metrics.span("pose.resize_inputs"):
+        classifier_inputs = classifier.resize_inputs([f for _, f in window])
+    np.savez(str(output_dir / "classifier_inputs.npz"), frame_idx=window_idx, inputs=classifier_inputs)
+    return {
+        "stroke_pose": stroke_pose,
+        "contact_pose": pose_arr,
+        "window_idx": window_idx,
+        "classifier_inputs": classifier_inputs,
+    }
+
+
+def load_pose(output_dir):
+    """Reads back what estimate_pose() wrote."""
+    with np.load(str(output_dir / "classifier_inputs.npz")) as data:
+        window_idx, classifier_inputs = data["frame_idx"], data["inputs"]
+    return {
+        "stroke_pose": np.load(str(output_dir / "stroke_pose.npy")),
+        "contact_pose": np.load(str(output_dir / "contact_pose.npy")),
+        "window_idx": window_idx,
+        "classifier_inputs": classifier_inputs,
+    }
 
-    # paste pose overlay back on original
-    contact_frame[by1:by2, bx1:bx2] = annotated_cropped
-    cv2.imwrite(str(OUTPUT_DIR / "contact_frame_pose.jpg"), contact_frame)
-    np.save(str(OUTPUT_DIR / "contact_pose.npy"), pose_arr)
 
-    # predict stroke type on cropped
-    stroke_type, confidence = predict_stroke_type(str(contact_img_path), classifier_model)
+def analyze_contact(scan, pose, output_dir, options, models, metrics=None):
+    """Stroke classification, stroke matching and suggestions for the contact frame."""
+    metrics = metrics or NULL_METRICS
+    contact_frame_idx = scan["contact_frame_idx"]
+    classifier = models["classifier"]
+    stroke_pose, pose_arr = pose["stroke_pose"], pose["contact_pose"]
+    window_idx = [int(idx) for idx in pose["window_idx"]]
+    contact_offset = window_idx.index(contact_frame_idx)
+
+    # predict stroke type in memory, averaged over the frames around contact
+    classify_frames = [inputs for idx, inputs in zip(window_idx, pose["classifier_inputs"])
+                       if abs(idx - contact_frame_idx) <= options.classify_frames]
+    top_labels = classifier.predict_averaged(classify_frames, top_k=options.top_k, metrics=metrics)
+    stroke_type, confidence = top_labels[0]
     print(f"[✅] Stroke Type: {stroke_type} ({confidence*100:.1f}% confidence)")
 
-    # reference pose suggestions
-    ref_pose_path = ROOT_DIR / "pose_estimation" / "reference_poses" / f"{stroke_type}.npy"
-    if ref_pose_path.exists():
-        suggestions = get_ai_suggestions(str(ref_pose_path), str(OUTPUT_DIR / "contact_pose.npy"), stroke_type)
-    else:
-        suggestions = ["⚠️ No reference pose found for this stroke type."]
+    # stroke sequence vs reference sequences (DTW)
+    with metrics.span("analyze.stroke_match"):
+        stroke_match = compare_stroke(stroke_pose, load_reference_sequences(stroke_type), contact_offset)
+    phase_deviations = stroke_match["phase_deviations"] if stroke_match else None
+
+    # reference pose suggestions, against the closest reference of this stroke
+    reference_pose = None
+    if len(pose_arr):
+        with metrics.span("analyze.reference_knn"):
+            ref_names, ref_poses, _ = get_reference_library().nearest(stroke_type, pose_arr, k=1)
+        if ref_names:
+            reference_pose = ref_names[0]
+    with metrics.span("analyze.suggestions"):
+        if reference_pose is not None:
+            suggestions = get_ai_suggestions(ref_poses[0], pose_arr, stroke_type,
+                                             phase_deviations=phase_deviations)
+        elif phase_deviations:
+            suggestions = get_ai_suggestions(None, None, stroke_type, phase_deviations=phase_deviations)
+        else:
+            suggestions = ["⚠️ No reference pose found for this stroke type."]
 
     # feedback
-    with open(OUTPUT_DIR / "feedback.json", "w") as f:
-        json.dump({
-            "stroke_type": stroke_type,
-            "confidence": confidence,
-            "suggestions": suggestions
-        }, f)
-
-else:
-    print("[⚠️] No contact detected or batsman missing.")
-
-# === Streamlit re-encode
-subprocess.run([
-    "ffmpeg", "-y", "-i", str(OUTPUT_DIR / "annotated_video.mp4"),
-    "-vcodec", "libx264", "-acodec", "aac",
-    str(OUTPUT_DIR / "annotated_video_streamlit.mp4")
-])
-
-print(f"[✅] Outputs saved to: {OUTPUT_DIR}")
+    feedback = {
+        "stroke_type": stroke_type,
+        "confidence": confidence,
+        "suggestions": suggestions,
+        "top_k": top_labels
+    }
+    if reference_pose is not None:
+        feedback["reference_pose"] = reference_pose
+    if stroke_match:
+        feedback["stroke_match"] = {
+            "best_reference": stroke_match["best_reference"],
+            "distance": stroke_match["distance"],
+            "window": [window_idx[0], contact_frame_idx, window_idx[-1]],
+            "phase_deviations": {
+                phase: {name: float(dev[idx]) for name, idx in KEYPOINTS.items()}
+                for phase, dev in phase_deviations.items()
+            },
+        }
+    with open(output_dir / "feedback.json", "w") as f:
+        json.dump(feedback, f)
+    return feedback
+
+
+# === Result cache ===
+# Options that change what the detection pass produces (video, contact, pose)
+SCAN_OPTIONS = ("context_frames", "stride", "coarse_margin", "roi", "roi_pad", "roi_refresh", "roi_min_conf",
+                "trail_opacity", "trail_fade", "video_preset", "video_crf", "preview_height")
+# Options that only change classification and feedback
+RESULT_OPTIONS = ("classify_frames", "classifier_backend", "top_k")
+# Files of the detection pass that a partial cache hit links into the new output
+SCAN_ARTIFACTS = ("annotated_video_streamlit.mp4", PREVIEW_NAME, TRACK_NAME, "contact_frame.jpg", "contact_frame_pose.jpg",
+                  "stroke_pose.npy", "contact_pose.npy", "classifier_inputs.npz")
+
+
+def classifier_files(backend):
+    files = [CLASSIFIER_MODEL_PATH, CLASS_MAPPING_PATH]
+    if backend != "eager":
+        files.append(os.path.join(EXPORT_DIR, EXPORT_FILES[backend]))
+    return files
+
+
+def reference_files():
+    # poses plus the contact-frame sidecars of sequences
+    return sorted(p for p in REFERENCE_DIR.rglob("*") if p.suffix in (".npy", ".json")) + [RULES_PATH]
+
+
+def cache_keys(input_video, options, video_hash=None):
+    """
+    (scan key, result key). The scan key covers the video content, the YOLO
+    weights and the detection options; the result key adds the classifier
+    weights, the reference poses and rules, and the classification options.
+    """
+    video_hash = video_hash or file_sha256(input_video)
+    scan_key = cache_key("scan", video_hash, fingerprint([YOLO_MODEL_PATH]),
+                         {name: getattr(options, name) for name in SCAN_OPTIONS})
+    result_key = cache_key("result", scan_key, fingerprint(classifier_files(options.classifier_backend)),
+                           fingerprint(reference_files()),
+                           {name: getattr(options, name) for name in RESULT_OPTIONS})
+    return scan_key, result_key
+
+
+def _run_analysis(input_video, output_dir, options, models, progress, cached_scan, metrics):
+    """
+    Detection (or the cached scan), pose and feedback.
+    Returns (scan, feedback or None, whether the cached scan was reused).
+    """
+    if cached_scan is not None:
+        scan_dir, scan = cached_scan
+        print(f"[♻️] Reusing detection and pose from: {scan_dir}")
+        with metrics.span("cache_link"):
+            try:
+                for name in SCAN_ARTIFACTS:
+                    if (scan_dir / name).exists():
+                        link_or_copy(scan_dir / name, output_dir / name)
+                if not scan_dir.is_dir():
+                    raise FileNotFoundError(scan_dir)
+            except FileNotFoundError:
+                # another worker evicted the cached run while we linked from it
+                print("[⚠️] Cached detection was evicted meanwhile; running it again.")
+                cached_scan = None
+    if cached_scan is None:
+        progress(0.0, "Detecting ball and batsman")
+        with metrics.span("scan"):
+            scan = scan_video(input_video, output_dir, options, models, progress, metrics)
+
+    feedback = None
+    if scan["contact_frame_idx"] != -1 and scan["batsman_box"]:
+        if cached_scan is not None:
+            pose = load_pose(output_dir)
+        else:
+            progress(0.8, "Estimating pose")
+            with metrics.span("pose"):
+                pose = estimate_pose(scan, output_dir, models["classifier"], metrics)
+        progress(0.9, "Classifying stroke")
+        with metrics.span("analyze"):
+            feedback = analyze_contact(scan, pose, output_dir, options, models, metrics)
+    else:
+        print("[⚠️] No contact detected or batsman missing.")
+    return scan, feedback, cached_scan is not None
+
+
+def analyze_video(input_video, output_dir=None, options=None, models=None, progress=None, video_hash=None):
+    """
+    Runs the full analysis of one video and returns a summary dict.
+
+    `models` comes from load_models() and can be reused across calls, which is
+    what keeps worker processes warm. `progress(fraction, message)` is called
+    as the job advances.
+
+    With the cache on, an identical video with the same models and options
+    returns the earlier summary and output directory right away; if only the
+    classifier, references or classification options changed, detection and
+    pose are reused and only classification and feedback run again.
+    `video_hash` skips hashing the video when the caller already has it.
+
+    `options.replay` re-runs everything after detection from a saved
+    detections.npz; it always bypasses the cache, since the point is to try
+    changed downstream code. `input_video` defaults to the track's source.
+
+    Per-span timings and counters are written to metrics.json (and to
+    `options.prometheus_textfile` if set); `options.profile` adds a
+    cProfile or pyinstrument capture of the analysis.
+    """
+    options = options if options is not None else default_options()
+    progress = progress or _no_progress
+    if options.replay and not input_video:
+        input_video = DetectionTrack.load(replay_track_path(options.replay)).meta["video"]
+
+    started = time.perf_counter()
+    # ru_maxrss only ever grows, so in a warm worker the job's share is the growth
+    rss_before = peak_rss_mb()
+    metrics = Metrics()
+    with metrics.span("hash"):
+        video_hash = video_hash or file_sha256(input_video)
+    video_name = Path(input_video).stem
+    catalog = Catalog()
+
+    cache = cached_scan = None
+    if options.cache and not options.replay:
+        cache = ResultCache(DEFAULT_OUTPUT_ROOT, max_bytes=int(options.cache_max_gb * 1024 ** 3))
+        scan_key, result_key = cache_keys(input_video, options, video_hash)
+        hit = cache.get(result_key)
+        if hit is not None:
+            print(f"[✅] Cache hit, outputs at: {hit[0]}")
+            summary = dict(hit[1], output_dir=str(hit[0]), cache="hit")
+            catalog.record(summary, video_name, video_hash)
+            progress(1.0, "Done (cached)")
+            return summary
+        cached_scan = cache.get(scan_key)
+
+    if models is None:
+        with metrics.span("load_models"):
+            models = load_models(options.classifier_backend, detector=not options.replay)
+    output_dir = Path(output_dir) if output_dir else new_output_dir(input_video)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    with profiled(options.profile, output_dir):
+        scan, feedback, reused_scan = _run_analysis(input_video, output_dir, options, models, progress,
+                                                    cached_scan, metrics)
+
+    # === Run stats
+    process_peak = peak_rss_mb()
+    run_stats = dict(scan["stats"], video=video_name, cache="partial" if reused_scan else "miss",
+                     duration_s=time.perf_counter() - started,
+                     # high-water mark of the whole process, including earlier jobs of a warm worker
+                     process_peak_rss_mb=process_peak,
+                     peak_rss_growth_mb=process_peak - rss_before if process_peak is not None else None)
+    metrics.add_time("total", run_stats["duration_s"])
+    run_stats.update(metrics.as_dict())
+    write_metrics(output_dir / "metrics.json", run_stats)
+    if options.prometheus_textfile:
+        write_prometheus_textfile(options.prometheus_textfile, metrics,
+                                  labels={"video": video_name, "cache": run_stats["cache"]})
+    print("[📈] Time by stage: " + metrics.summary(("hash", "load_models", "cache_link", "scan", "pose",
+                                                     "analyze", "total")))
+    if process_peak is not None:
+        print(f"[📈] Process peak RSS: {process_peak:.1f} MB, +{run_stats['peak_rss_growth_mb']:.1f} MB "
+              f"during this job (frame buffer: {run_stats['frame_buffer_peak_mb']:.1f} MB)")
+
+    summary = {
+        "output_dir": str(output_dir),
+        "contact_frame_idx": scan["contact_frame_idx"],
+        "stroke_type": feedback["stroke_type"] if feedback else "unknown",
+        "confidence": feedback["confidence"] if feedback else None,
+        "suggestions": feedback["suggestions"] if feedback else [],
+        "metrics": run_stats,
+    }
+    if cache is not None:
+        if not reused_scan:
+            cache.put(scan_key, "scan", output_dir, {
+                "contact_frame_idx": scan["contact_frame_idx"],
+                "batsman_box": scan["batsman_box"],
+                "ball_centers": scan["ball_centers"],
+                "stats": scan["stats"],
+            })
+        cache.put(result_key, "result", output_dir, summary)
+        catalog.remove(cache.evict(keep=[output_dir]))
+    catalog.record(summary, video_name, video_hash)
+
+    progress(1.0, "Done")
+    print(f"[✅] Outputs saved to: {output_dir}")
+    return dict(summary, cache=run_stats["cache"])
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.replay:
+        if not replay_track_path(args.replay).exists():
+            print(f"[❌] Detection track not found: {replay_track_path(args.replay)}")
+            sys.exit(1)
+    elif args.input_video:
+        if not os.path.exists(args.input_video):
+            print(f"[❌] Input video not found: {args.input_video}")
+            sys.exit(1)
+    else:
+        print("[❌] Please provide input video path.")
+        sys.exit(1)
+
+    analyze_video(args.input_video, options=args)
+
+
+if __name__ == "__main__":
+    main()
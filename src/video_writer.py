@@ -0,0 +1,79 @@
+# src/video_writer.py
+
+import shutil
+import subprocess
+import tempfile
+
+import cv2
+import numpy as np
+
+PREVIEW_NAME = "annotated_preview.mp4"
+
+
+class FfmpegWriter:
+    """
+    Streams BGR frames into one ffmpeg process that encodes H.264 directly.
+
+    Frames go through stdin as rawvideo, so the video is encoded once and
+    plays in the browser as is. Odd frame sizes are padded to even ones, as
+    yuv420p needs. With `preview_path`, the same process also writes a
+    downscaled rendition `preview_height` pixels tall.
+    """
+
+    def __init__(self, path, fps, size, preset="veryfast", crf=23,
+                 preview_path=None, preview_height=360, ffmpeg="ffmpeg"):
+        width, height = size
+        self.path = str(path)
+        self.preview_path = str(preview_path) if preview_path else None
+        self.size = (width, height)
+        encode = ["-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+                  "-pix_fmt", "yuv420p", "-movflags", "+faststart"]
+        cmd = [
+            ffmpeg, "-y", "-loglevel", "error", "-nostats",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", f"{fps}",
+            "-i", "-",
+            "-map", "0:v", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", *encode, self.path,
+        ]
+        if self.preview_path:
+            preview_height = min(preview_height, height) // 2 * 2
+            cmd += ["-map", "0:v", "-vf", f"scale=-2:{preview_height}", *encode, self.preview_path]
+        # stderr goes to a file, not a pipe: nobody reads it until the end, and a
+        # full pipe buffer would block ffmpeg and with it our stdin writes
+        self._stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self._stderr)
+
+    def _error_output(self):
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors="replace").strip()
+
+    def write(self, frame):
+        try:
+            self.proc.stdin.write(memoryview(np.ascontiguousarray(frame)))
+        except BrokenPipeError:
+            self.proc.wait()
+            raise RuntimeError(f"ffmpeg exited while encoding {self.path}: {self._error_output()}")
+
+    def release(self):
+        if self.proc.stdin and not self.proc.stdin.closed:
+            try:
+                self.proc.stdin.close()
+            except BrokenPipeError:
+                pass
+        returncode = self.proc.wait()
+        stderr = self._error_output()
+        self._stderr.close()
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg failed ({returncode}) encoding {self.path}: {stderr}")
+
+
+def open_video_writer(path, fps, size, preset="veryfast", crf=23, preview_path=None, preview_height=360):
+    """
+    H.264 writer through ffmpeg when it is on PATH, otherwise an OpenCV
+    mp4v writer (no preview). Returns (writer, encoder name).
+    """
+    fps = fps or 30.0
+    if shutil.which("ffmpeg"):
+        return FfmpegWriter(path, fps, size, preset=preset, crf=crf,
+                            preview_path=preview_path, preview_height=preview_height), "libx264"
+    print("[⚠️] ffmpeg not found; writing mp4v with OpenCV (may not play in the browser).")
+    return cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, size), "mp4v"